@@ -16,7 +16,17 @@ finally:
     del version, PackageNotFoundError
 
 
+from .cache import CacheBackend, InMemoryCacheBackend, LoaderCache
+from .coalescing import StatementCoalescer
 from .loader import StrawberrySQLAlchemyLoader
 from .mapper import StrawberrySQLAlchemyMapper
 
-__all__ = ["__version__", "StrawberrySQLAlchemyLoader", "StrawberrySQLAlchemyMapper"]
+__all__ = [
+    "__version__",
+    "CacheBackend",
+    "InMemoryCacheBackend",
+    "LoaderCache",
+    "StatementCoalescer",
+    "StrawberrySQLAlchemyLoader",
+    "StrawberrySQLAlchemyMapper",
+]
@@ -0,0 +1,378 @@
+import abc
+import dataclasses
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import ORMExecuteState, RelationshipProperty, Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from strawberry_sqlalchemy_mapper.relay import PagingList
+
+
+class CacheBackend(abc.ABC):
+    """
+    Storage of a LoaderCache.
+
+    Keys and values are built from plain python values and mapped classes,
+    so that they can be pickled by backends backed by an external store.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value stored for `key`, or None if there is none"""
+
+    @abc.abstractmethod
+    def set(
+        self, key: Hashable, value: Any, ttl: Optional[float], tags: Iterable[str]
+    ) -> None:
+        """
+        Store `value` for `key`, for `ttl` seconds if given.
+        Entries are invalidated by any of their `tags`.
+        """
+
+    @abc.abstractmethod
+    def invalidate(self, tags: Iterable[str]) -> None:
+        """Remove all entries stored with any of the given tags"""
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Size-bounded LRU backend, local to the process
+    """
+
+    def __init__(self, max_size: int = 10000) -> None:
+        self.max_size = max_size
+        # Entries are (expiration time, value, tags), least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[Any, ...]]" = OrderedDict()
+        self._tagged: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            self._tagged[tag].discard(key)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            try:
+                expires_at, value, _ = self._entries[key]
+            except KeyError:
+                return None
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(
+        self, key: Hashable, value: Any, ttl: Optional[float], tags: Iterable[str]
+    ) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._tagged[tag].add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tagged.pop(tag, ())):
+                    self._remove(key)
+
+
+class _Snapshot(tuple):
+    """
+    Class and loaded column values of an ORM instance
+    """
+
+    @classmethod
+    def of(cls, obj: Any) -> "_Snapshot":
+        state = inspect(obj)
+        values = {
+            prop.key: state.dict[prop.key]
+            for prop in state.mapper.column_attrs
+            if prop.key in state.dict
+        }
+        return cls((type(obj), values))
+
+    def restore(self, session: Session) -> Any:
+        """
+        Return the instance in `session`, creating it if needed
+        """
+        class_, values = self
+        mapper = inspect(class_)
+        identity_key = mapper.identity_key_from_primary_key(
+            [values[mapper.get_property_by_column(c).key] for c in mapper.primary_key]
+        )
+        obj = session.identity_map.get(identity_key)
+        if obj is not None and not inspect(obj).unloaded.intersection(values):
+            return obj
+        obj = mapper.class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(obj, key, value)
+        make_transient_to_detached(obj)
+        return session.merge(obj, load=False)
+
+
+def _tables_of(mapper: Any) -> Set[str]:
+    return {table.key for table in inspect(mapper).tables}
+
+
+class LoaderCache:
+    """
+    Result cache of relationship loaders, shared across requests.
+
+    Results are keyed by relationship, relationship key, projection, page
+    window, filter criteria, ordering, polymorphic subclasses and joined
+    relationships. Only column values are stored: cached objects are rebuilt
+    in (or taken from) the session of each request.
+
+    Entries are tagged with the tables of related objects, and invalidated
+    once sessions (of the `target` session class or sessionmaker) commit
+    changes to these tables. Writes that don't go through the ORM, or made
+    by other processes, are only picked up once entries expire.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        ttl: Optional[float] = 60,
+        negative_ttl: Optional[float] = None,
+        target: Any = Session,
+    ) -> None:
+        """
+        Args:
+            backend: Where entries are stored, by default an
+                InMemoryCacheBackend
+            ttl: Lifetime of entries, in seconds
+            negative_ttl: Lifetime of missing to-one results,
+                by default the same as `ttl`
+            target: Session class or sessionmaker whose commits
+                invalidate entries
+        """
+        self.backend = backend if backend is not None else InMemoryCacheBackend()
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self.target = target
+        self.hits = 0
+        self.misses = 0
+        # Tables changed by sessions since their transaction began
+        self._pending: MutableMapping[Session, Set[str]] = weakref.WeakKeyDictionary()
+        # Incremented on invalidation, so that results loaded while
+        # a table changes are not stored
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._listeners = [
+            ("after_flush", self._after_flush),
+            ("do_orm_execute", self._do_orm_execute),
+            ("after_commit", self._after_commit),
+            ("after_rollback", self._after_rollback),
+        ]
+        for name, listener in self._listeners:
+            event.listen(target, name, listener)
+
+    def close(self) -> None:
+        """Stop listening to session events"""
+        for name, listener in self._listeners:
+            event.remove(self.target, name, listener)
+
+    def _changed(self, session: Session, tables: Iterable[str]) -> None:
+        self._pending.setdefault(session, set()).update(tables)
+
+    def _after_flush(self, session: Session, flush_context: Any) -> None:
+        for obj in [*session.new, *session.dirty, *session.deleted]:
+            self._changed(session, _tables_of(type(obj)))
+
+    def _do_orm_execute(self, orm_execute_state: ORMExecuteState) -> None:
+        if orm_execute_state.is_update or orm_execute_state.is_delete:
+            table = orm_execute_state.statement.table
+            self._changed(orm_execute_state.session, [table.key])
+
+    def _after_commit(self, session: Session) -> None:
+        tables = self._pending.pop(session, set())
+        if tables:
+            self.invalidate(tables)
+
+    def _after_rollback(self, session: Session) -> None:
+        self._pending.pop(session, None)
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        """Invalidate entries depending on any of the given table keys"""
+        tables = list(tables)
+        for table in tables:
+            self._generations[table] += 1
+        self.backend.invalidate(tables)
+
+    @staticmethod
+    def tables_for(relationship: RelationshipProperty) -> FrozenSet[str]:
+        """Keys of the tables results of `relationship` depend on"""
+        tables = _tables_of(relationship.mapper)
+        if relationship.secondary is not None:
+            tables.add(relationship.secondary.key)
+        return frozenset(tables)
+
+    def generation(self, relationship: RelationshipProperty) -> Tuple[int, ...]:
+        return tuple(
+            self._generations[table] for table in sorted(self.tables_for(relationship))
+        )
+
+    def usable_by(self, session: Session, relationship: RelationshipProperty) -> bool:
+        """
+        Whether `session` can share results of `relationship`: it must not
+        have changed the tables they depend on, as other sessions would not
+        see these changes
+        """
+        tables = self.tables_for(relationship)
+        if tables.intersection(self._pending.get(session, ())):
+            return False
+        return not any(
+            tables.intersection(_tables_of(type(obj)))
+            for obj in [*session.new, *session.dirty, *session.deleted]
+        )
+
+    @staticmethod
+    def key_for(
+        relationship: RelationshipProperty,
+        projection: Optional[FrozenSet[str]],
+        window: Optional[Tuple],
+        key: Tuple,
+        total_count: bool = False,
+        where: Tuple = (),
+        ordering: Tuple = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+        joined: FrozenSet[str] = frozenset(),
+    ) -> Tuple:
+        return (
+            str(relationship),
+            tuple(sorted(projection)) if projection is not None else None,
+            tuple(window) if window is not None else None,
+            total_count,
+            where,
+            ordering,
+            tuple(sorted(f"{c.__module__}.{c.__qualname__}" for c in polymorphic)),
+            tuple(sorted(joined)),
+            key,
+        )
+
+    def get(
+        self,
+        session: Session,
+        relationship: RelationshipProperty,
+        projection: Optional[FrozenSet[str]],
+        window: Optional[Tuple],
+        key: Tuple,
+        total_count: bool = False,
+        where: Tuple = (),
+        ordering: Tuple = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+        joined: FrozenSet[str] = frozenset(),
+    ) -> Optional[Tuple[Any]]:
+        """
+        Return a 1-tuple holding the cached result, rebuilt in `session`,
+        or None if there is none
+        """
+        entry = self.backend.get(
+            self.key_for(
+                relationship,
+                projection,
+                window,
+                key,
+                total_count,
+                where,
+                ordering,
+                polymorphic,
+                joined,
+            )
+        )
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        kind, data = entry
+        if kind == "none":
+            return (None,)
+        if kind == "object":
+            return (data.restore(session),)
+        page_info, snapshots, count = data
+        return (
+            PagingList(
+                [snapshot.restore(session) for snapshot in snapshots],
+                page_info=(
+                    dataclasses.replace(page_info) if page_info is not None else None
+                ),
+                total_count=count,
+            ),
+        )
+
+    def set(
+        self,
+        relationship: RelationshipProperty,
+        projection: Optional[FrozenSet[str]],
+        window: Optional[Tuple],
+        key: Tuple,
+        value: Any,
+        generation: Tuple[int, ...],
+        total_count: bool = False,
+        where: Tuple = (),
+        ordering: Tuple = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+        joined: FrozenSet[str] = frozenset(),
+    ) -> None:
+        """
+        Store the result of `relationship` for `key`, unless the tables it
+        depends on were changed since `generation`
+        """
+        if generation != self.generation(relationship):
+            return
+        ttl = self.ttl
+        if value is None:
+            entry: Tuple[str, Any] = ("none", None)
+            ttl = self.negative_ttl
+        elif isinstance(value, list):
+            snapshots: List[_Snapshot] = [_Snapshot.of(obj) for obj in value]
+            page_info = getattr(value, "_page_info", None)
+            if page_info is not None:
+                page_info = dataclasses.replace(page_info)
+            count = getattr(value, "total_count", None)
+            entry = ("list", (page_info, snapshots, count))
+        else:
+            entry = ("object", _Snapshot.of(value))
+        self.backend.set(
+            self.key_for(
+                relationship,
+                projection,
+                window,
+                key,
+                total_count,
+                where,
+                ordering,
+                polymorphic,
+                joined,
+            ),
+            entry,
+            ttl,
+            self.tables_for(relationship),
+        )
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from sqlalchemy.engine import Engine, Row
+from sqlalchemy.sql import Select
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    Make bind parameter values hashable (expanding IN parameters are lists)
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def _retrieve_exception(task: "asyncio.Future[Any]") -> None:
+    # Callers may all have been cancelled, leaving nobody to retrieve it
+    if not task.cancelled():
+        task.exception()
+
+
+class StatementCoalescer:
+    """
+    Process-level single flight for loader statements.
+
+    Share one instance between the loaders of concurrent requests: while
+    a statement is in flight, loaders executing an identical statement
+    (same SQL, same parameters, same bind) await its rows instead of
+    querying the database again. Rows are never kept once the statement
+    completes, so no staleness is introduced. A statement runs to completion
+    even if the caller that started it is cancelled.
+
+    Only loaders bound to an AsyncEngine or a sessionmaker use it, since
+    their statements run outside of the request transaction: each loader
+    then merges the shared rows into its own session.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: Dict[Tuple, "asyncio.Future[List[Row]]"] = {}
+        #: Number of statements executed, and of executions avoided
+        self.executed = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key_for(bind: Engine, statement: Select) -> Tuple:
+        """
+        Key identifying `statement`, as executed on `bind`
+        by the running event loop
+        """
+        compiled = statement.compile(dialect=bind.dialect)
+        return (
+            asyncio.get_running_loop(),
+            bind,
+            str(compiled),
+            _freeze(compiled.params),
+        )
+
+    async def execute(
+        self, key: Tuple, execute: Callable[[], Awaitable[List[Row]]]
+    ) -> List[Row]:
+        """
+        Run `execute`, unless a statement with the same key is in flight,
+        in which case its rows are awaited instead
+        """
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # The statement runs in its own task, which the first caller
+            # doesn't own: cancelling it leaves the others their rows
+            task = asyncio.ensure_future(self._run(key, execute))
+            task.add_done_callback(_retrieve_exception)
+            self._in_flight[key] = task
+            self.executed += 1
+        return await asyncio.shield(task)
+
+    async def _run(
+        self, key: Tuple, execute: Callable[[], Awaitable[List[Row]]]
+    ) -> List[Row]:
+        try:
+            return await execute()
+        finally:
+            del self._in_flight[key]
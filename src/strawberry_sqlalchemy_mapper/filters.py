@@ -0,0 +1,153 @@
+import dataclasses
+import enum
+import operator
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import strawberry
+from sqlalchemy.sql import ColumnElement
+
+
+#: Hashable, canonical form of a where input:
+#: sorted `(column attribute key, operator name, value)` tuples
+Criteria = Tuple[Tuple[str, str, Any], ...]
+
+#: Hashable, canonical form of order by inputs:
+#: `(column attribute key, descending)` tuples, by decreasing precedence
+Ordering = Tuple[Tuple[str, bool], ...]
+
+#: SQL and python implementations of filter operators
+_OPERATORS: Dict[str, Tuple[Callable[[Any, Any], Any], Callable[[Any, Any], bool]]] = {
+    "eq": (operator.eq, operator.eq),
+    "ne": (operator.ne, operator.ne),
+    "gt": (operator.gt, operator.gt),
+    "gte": (operator.ge, operator.ge),
+    "lt": (operator.lt, operator.lt),
+    "lte": (operator.le, operator.le),
+    "in": (lambda column, values: column.in_(values), lambda a, b: a in b),
+    "is_null": (
+        lambda column, is_null: column.is_(None) if is_null else column.isnot(None),
+        lambda value, is_null: (value is None) == is_null,
+    ),
+}
+#: Operators of filters on columns that can't be ordered
+EQUALITY_OPERATORS = ["eq", "ne", "in", "is_null"]
+#: Operators of filters on columns that can be ordered
+ORDERING_OPERATORS = ["eq", "ne", "gt", "gte", "lt", "lte", "in", "is_null"]
+#: Dialects sorting NULL values before others in ascending order by default,
+#: some of which don't support NULLS FIRST/LAST
+_NULLS_FIRST_DIALECTS = frozenset(["sqlite", "mysql", "mariadb", "mssql"])
+
+
+@strawberry.enum
+class OrderDirection(enum.Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+def criteria_from_where(where: Any) -> Criteria:
+    """
+    Convert a generated <Type>Where input into criteria
+    """
+    criteria = []
+    if where is not None:
+        for field in dataclasses.fields(where):
+            column_filter = getattr(where, field.name)
+            if column_filter is None:
+                continue
+            for filter_field in dataclasses.fields(column_filter):
+                value = getattr(column_filter, filter_field.name)
+                if value is None:
+                    continue
+                name = filter_field.name.rstrip("_")
+                if name == "in":
+                    value = tuple(value)
+                criteria.append((field.name, name, value))
+    return tuple(sorted(criteria, key=lambda criterion: criterion[:2]))
+
+
+def criteria_clauses(model: Any, criteria: Criteria) -> List[ColumnElement]:
+    """
+    SQL expressions of criteria, on the columns of `model`
+    (which may be an alias)
+    """
+    return [
+        _OPERATORS[name][0](getattr(model, key), value) for key, name, value in criteria
+    ]
+
+
+def matches(obj: Any, criteria: Criteria) -> bool:
+    """
+    Whether an object matches criteria, evaluated like SQL would:
+    comparisons of NULL values never match
+    """
+    for key, name, value in criteria:
+        attribute = getattr(obj, key)
+        if attribute is None and name != "is_null":
+            return False
+        if not _OPERATORS[name][1](attribute, value):
+            return False
+    return True
+
+
+def ordering_from_order_by(order_by: Optional[Sequence[Any]]) -> Ordering:
+    """
+    Convert a list of generated <Type>OrderBy inputs into an ordering.
+    Columns given in the same input are ordered by in declaration order.
+    """
+    ordering = []
+    for item in order_by or ():
+        for field in dataclasses.fields(item):
+            direction = getattr(item, field.name)
+            if direction is not None:
+                ordering.append((field.name, direction == OrderDirection.DESC))
+    return tuple(ordering)
+
+
+def nulls_first_by_default(dialect_name: Optional[str], descending: bool) -> bool:
+    """
+    Whether the dialect places NULL values first when an ORDER BY clause
+    doesn't say: they are the smallest values on `_NULLS_FIRST_DIALECTS`,
+    and the largest elsewhere
+    """
+    return descending != (dialect_name in _NULLS_FIRST_DIALECTS)
+
+
+def ordering_clauses(
+    model: Any, ordering: Ordering, dialect_name: Optional[str] = None
+) -> List[ColumnElement]:
+    """
+    SQL expressions of an ordering, on the columns of `model`.
+
+    NULL values come first in ascending order, and last in descending order,
+    like with `sort`. Their placement is explicit unless the `dialect_name`
+    already sorts them that way.
+    """
+    clauses = []
+    for key, descending in ordering:
+        column = getattr(model, key)
+        clause = column.desc() if descending else column.asc()
+        if dialect_name not in _NULLS_FIRST_DIALECTS:
+            clause = clause.nulls_last() if descending else clause.nulls_first()
+        clauses.append(clause)
+    return clauses
+
+
+def sort(objects: Sequence[Any], ordering: Ordering) -> List[Any]:
+    """
+    Sort objects like SQL would with the given ordering,
+    NULL values being first in ascending order (see `ordering_clauses`)
+    """
+
+    def sort_key(key: str) -> Callable[[Any], Tuple[bool, Any]]:
+        def get(obj: Any) -> Tuple[bool, Any]:
+            value = getattr(obj, key)
+            # NULL values are never compared to others
+            return (False, 0) if value is None else (True, value)
+
+        return get
+
+    objects = list(objects)
+    # Sort by the least significant column first, relying on sort stability
+    for key, descending in reversed(ordering):
+        objects.sort(key=sort_key(key), reverse=descending)
+    return objects
@@ -1,177 +1,2022 @@
-from collections import defaultdict
-from typing import Any, Dict, List, Mapping, Tuple
+import asyncio
+import enum
+from collections import Counter, defaultdict
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Counter as CounterType,
+    Dict,
+    FrozenSet,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-from sqlalchemy import desc, func, literal_column, over, select, tuple_
-from sqlalchemy.orm import RelationshipProperty, aliased
+from sqlalchemy import (
+    and_,
+    asc,
+    desc,
+    func,
+    inspect,
+    literal,
+    or_,
+    over,
+    select,
+    true,
+    tuple_,
+    union_all,
+)
+from sqlalchemy.engine import Dialect, Row
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import (
+    MANYTOONE,
+    ONETOMANY,
+    Mapper,
+    RelationshipProperty,
+    aliased,
+    joinedload,
+    load_only,
+    sessionmaker,
+    with_polymorphic,
+)
+from sqlalchemy.sql import ColumnElement, Select, expression, operators, visitors
+from sqlalchemy.sql.elements import (
+    BinaryExpression,
+    BindParameter,
+    ColumnClause,
+    UnaryExpression,
+)
 from strawberry.dataloader import DataLoader
 
+from strawberry_sqlalchemy_mapper.cache import LoaderCache
+from strawberry_sqlalchemy_mapper.coalescing import StatementCoalescer
+from strawberry_sqlalchemy_mapper.filters import (
+    Criteria,
+    Ordering,
+    criteria_clauses,
+    nulls_first_by_default,
+    ordering_clauses,
+)
 from strawberry_sqlalchemy_mapper.relay import (
     PageInfo,
     PagingList,
     RelativePageInput,
+    count_statement,
     cursor_from_obj,
 )
 
 
+#: Maximum number of bind parameters in a single statement, by dialect
+_DIALECT_MAX_BIND_PARAMS = {
+    "sqlite": 999,
+    "postgresql": 32767,
+    "mysql": 65535,
+    "mssql": 2100,
+    "oracle": 1000,
+}
+_DEFAULT_MAX_BIND_PARAMS = 999
+#: Bind parameters kept for everything but parent keys (limits, offsets...)
+_RESERVED_BIND_PARAMS = 32
+#: Maximum number of selects in a compound select, by dialect
+_DIALECT_MAX_COMPOUND_SELECTS = {"sqlite": 500}
+#: Dialects supporting VALUES lists as FROM clauses, with column names
+_VALUES_DIALECTS = frozenset(["postgresql"])
+
+
+def relationship_key_pairs(
+    relationship: RelationshipProperty,
+) -> List[Tuple[ColumnElement, ColumnElement]]:
+    """
+    Return (local, remote) column pairs linking parents to related rows.
+
+    Local columns belong to the parent, remote ones to the related table,
+    or to the association table for many-to-many relationships.
+    """
+    if relationship.secondary is not None:
+        return list(relationship.synchronize_pairs)
+    return list(relationship.local_remote_pairs)
+
+
+def has_custom_join(relationship: RelationshipProperty) -> bool:
+    """
+    Whether the join condition of a relationship is more than an equality
+    of its key pairs: extra criteria, function calls, other operators...
+    """
+    primaryjoin = relationship.primaryjoin
+    clauses = (
+        list(primaryjoin.clauses)
+        if primaryjoin.operator is operators.and_
+        else [primaryjoin]
+    )
+    return len(clauses) != len(relationship_key_pairs(relationship)) or not all(
+        isinstance(clause, BinaryExpression)
+        and clause.operator is operators.eq
+        and isinstance(clause.left, ColumnClause)
+        and isinstance(clause.right, ColumnClause)
+        for clause in clauses
+    )
+
+
+def is_self_referential(relationship: RelationshipProperty) -> bool:
+    """
+    Whether a relationship links objects of a model to objects of the same
+    model (adjacency lists), with a plain join that can be followed
+    recursively in SQL
+    """
+    return (
+        relationship.mapper is relationship.parent
+        and relationship.secondary is None
+        and not has_custom_join(relationship)
+    )
+
+
+def relationship_local_columns(relationship: RelationshipProperty) -> List[Any]:
+    """
+    Return the parent columns identifying related rows: local columns
+    of the key pairs, followed by any other parent column a custom join
+    condition depends on
+    """
+    columns = [local for local, _ in relationship_key_pairs(relationship)]
+    if has_custom_join(relationship):
+        _, bind_to_col, _ = relationship._join_condition.create_lazy_clause()
+        for column in bind_to_col.values():
+            if not any(column.compare(other) for other in columns):
+                columns.append(column)
+    return columns
+
+
+def relationship_key(relationship: RelationshipProperty, instance: Any) -> Tuple:
+    """
+    Return the key identifying related rows of `instance`,
+    as expected by loaders returned by `StrawberrySQLAlchemyLoader.loader_for`
+    """
+    mapper: Mapper = inspect(instance).mapper
+    return tuple(
+        [
+            getattr(instance, mapper.get_property_by_column(local).key)
+            for local in relationship_local_columns(relationship)
+        ]
+    )
+
+
+class PaginationStrategy(str, enum.Enum):
+    """
+    How paginated relationships are loaded for a batch of parents
+    """
+
+    #: Number all related rows with `row_number() OVER (PARTITION BY ...)`
+    #: and keep the ones of the page
+    WINDOW = "window"
+    #: Fetch each parent's page with a `JOIN LATERAL (... LIMIT n)`,
+    #: turning each page into an index range scan
+    LATERAL = "lateral"
+    #: Fetch each parent's page with its own `SELECT ... LIMIT n` and combine
+    #: them with `UNION ALL`. Works on any dialect, best for small batches.
+    UNION_ALL = "union_all"
+
+
+def _with_polymorphic(
+    model: Any, polymorphic: FrozenSet[type], selectable: Any = None
+) -> Any:
+    """
+    `with_polymorphic` entity of a model and some of its subclasses,
+    in a stable order
+    """
+    classes = sorted(polymorphic, key=lambda class_: class_.__qualname__)
+    if selectable is None:
+        return with_polymorphic(model, classes)
+    return with_polymorphic(model, classes, selectable=selectable)
+
+
+def _ordered_column(clause: Any) -> Any:
+    """
+    Column (or expression) of an ORDER BY clause, without its modifiers
+    """
+    while isinstance(clause, UnaryExpression) and clause.modifier in (
+        operators.asc_op,
+        operators.desc_op,
+        operators.nullsfirst_op,
+        operators.nullslast_op,
+    ):
+        clause = clause.element
+    return clause
+
+
+def _reverse_order(clause: Any) -> Any:
+    """
+    Reverse the direction of an ORDER BY clause,
+    along with the placement of NULL values
+    """
+    if isinstance(clause, UnaryExpression):
+        if clause.modifier is operators.nullsfirst_op:
+            return _reverse_order(clause.element).nulls_last()
+        if clause.modifier is operators.nullslast_op:
+            return _reverse_order(clause.element).nulls_first()
+        if clause.modifier is operators.desc_op:
+            return asc(clause.element)
+        if clause.modifier is operators.asc_op:
+            return desc(clause.element)
+    return desc(clause)
+
+
+def _order_direction(clause: Any) -> Tuple[bool, Optional[bool]]:
+    """
+    Whether an ORDER BY clause is descending, and whether it places NULL
+    values first (None when left to the dialect)
+    """
+    descending, nulls_first = False, None
+    while isinstance(clause, UnaryExpression):
+        if clause.modifier is operators.desc_op:
+            descending = True
+        elif clause.modifier is operators.nullsfirst_op:
+            nulls_first = True
+        elif clause.modifier is operators.nullslast_op:
+            nulls_first = False
+        elif clause.modifier is not operators.asc_op:
+            break
+        clause = clause.element
+    return descending, nulls_first
+
+
+class _PageWindow(NamedTuple):
+    """
+    Normalized form of a `RelativePageInput`.
+
+    Pages are computed on rows numbered from 1 for each parent, in descending
+    order when paginating backward: the page holds rows numbered
+    `after + 1` to `after + first`.
+
+    With a keyset `cursor` (the primary key of a related object), only rows
+    past the cursor row are numbered, and `after` is 0.
+    """
+
+    first: int
+    after: int
+    backward: bool
+    cursor: Optional[Tuple] = None
+
+    @classmethod
+    def from_page_input(
+        cls, page_input: Optional[RelativePageInput]
+    ) -> Optional["_PageWindow"]:
+        if not page_input:
+            return None
+        cursor = page_input.keyset
+        if page_input.first is not None:
+            after = page_input.after or 0
+            return cls(page_input.first, 0 if cursor else after, False, cursor)
+        # mypy
+        assert page_input.last is not None
+        before = abs(page_input.before or 0)
+        return cls(page_input.last, 0 if cursor else before, True, cursor)
+
+    @property
+    def lower(self) -> int:
+        """Lowest row number to fetch, one before the page if any"""
+        return max(self.after, 1)
+
+    @property
+    def upper(self) -> int:
+        """Highest row number to fetch, one past the page"""
+        return self.after + self.first + 1
+
+
 class StrawberrySQLAlchemyLoader:
     """
     Creates DataLoader instances on-the-fly for SQLAlchemy relationships
     """
 
-    _loaders: Dict[RelationshipProperty, DataLoader]
+    _loaders: Dict[
+        Tuple[
+            RelationshipProperty,
+            Optional[FrozenSet[str]],
+            bool,
+            Criteria,
+            Ordering,
+            FrozenSet[type],
+            FrozenSet[str],
+        ],
+        DataLoader,
+    ]
+    _count_loaders: Dict[Tuple[RelationshipProperty, Criteria], DataLoader]
+    _aggregate_loaders: Dict[
+        Tuple[RelationshipProperty, FrozenSet[Tuple[str, str]]], DataLoader
+    ]
+    _tree_loaders: Dict[Tuple[RelationshipProperty, int], DataLoader]
+    _primary_key_loaders: Dict[Mapper, DataLoader]
+    #: Columns the next batch of each primary key loader loads, None for all
+    _primary_key_projections: Dict[Mapper, Optional[Set[str]]]
+    _column_loaders: Dict[Tuple[Mapper, str], DataLoader]
+    _proxy_loaders: Dict[
+        Tuple[RelationshipProperty, RelationshipProperty, bool], DataLoader
+    ]
+    #: Non-paginated results known without loading them, by relationship and key
+    _known: Dict[RelationshipProperty, Dict[Tuple, Any]]
+    #: Number of paginated statements executed, by relationship and strategy
+    strategy_stats: CounterType[Tuple[RelationshipProperty, PaginationStrategy]]
 
-    def __init__(self, bind) -> None:
+    def __init__(
+        self,
+        bind,
+        pagination_strategy: Optional[Union[PaginationStrategy, str]] = None,
+        union_all_max_keys: int = 10,
+        max_batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        coalescer: Optional[StatementCoalescer] = None,
+        result_cache: Optional[LoaderCache] = None,
+    ) -> None:
+        """
+        Args:
+            bind: The AsyncSession used to execute statements. If an AsyncEngine
+                or a sessionmaker is given instead, each statement runs in its
+                own session (and pooled connection), allowing independent
+                batches to run concurrently. Loaded objects are then merged
+                into `session`, a session shared by the whole request, which
+                the loader opens itself: close the loader at the end of the
+                request, or use it as an async context manager.
+            pagination_strategy: Force the strategy used to load paginated
+                relationships. By default, it is picked from the batch size
+                and the dialect.
+            union_all_max_keys: Largest batch of parents paginated
+                with the UNION ALL strategy
+            max_batch_size: Largest number of parents loaded by a single
+                statement. By default, it is derived from the maximum number
+                of bind parameters supported by the dialect.
+            max_concurrency: Maximum number of statements running concurrently
+                when bound to an AsyncEngine or a sessionmaker
+            coalescer: Shared between the loaders of concurrent requests,
+                so that identical statements in flight are executed once.
+                Only used when bound to an AsyncEngine or a sessionmaker.
+            result_cache: Shared between the loaders of all requests,
+                so that results are reused until they expire or
+                their tables are changed.
+        """
         self._loaders = {}
+        self._count_loaders = {}
+        self._aggregate_loaders = {}
+        self._tree_loaders = {}
+        self._primary_key_loaders = {}
+        self._primary_key_projections = {}
+        self._column_loaders = {}
+        self._proxy_loaders = {}
         self.bind = bind
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.coalescer = coalescer
+        self.result_cache = result_cache
+        self.pagination_strategy = (
+            PaginationStrategy(pagination_strategy)
+            if pagination_strategy is not None
+            else None
+        )
+        self.union_all_max_keys = union_all_max_keys
+        self.strategy_stats = Counter()
+        self._known = defaultdict(dict)
+        self._sessionmaker: Optional[Callable[[], AsyncSession]] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        if isinstance(bind, AsyncEngine):
+            self._sessionmaker = sessionmaker(
+                bind, class_=AsyncSession, expire_on_commit=False
+            )
+        elif bind is not None and not isinstance(bind, AsyncSession):
+            self._sessionmaker = bind
+        if self._sessionmaker is not None:
+            self.session = self._sessionmaker()
+        else:
+            self.session = bind
+
+    async def close(self) -> None:
+        """
+        Close the request session if the loader opened it, that is when bound
+        to an AsyncEngine or a sessionmaker. A given AsyncSession is left open.
+        """
+        if self._sessionmaker is not None:
+            await self.session.close()
+
+    async def __aenter__(self) -> "StrawberrySQLAlchemyLoader":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    @property
+    def concurrent(self) -> bool:
+        """Whether independent statements can run concurrently"""
+        return self._sessionmaker is not None
+
+    def _dialect(self, mapper: Mapper) -> Dialect:
+        return self.session.get_bind(mapper=mapper).dialect
+
+    def max_batch_size_for(self, relationship: RelationshipProperty) -> int:
+        """
+        Return the largest number of parent keys loaded by a single statement
+        for the given relationship. Larger batches are split into chunks.
+        """
+        max_keys = self._max_keys_for(
+            relationship.mapper, len(relationship_local_columns(relationship))
+        )
+        if self.max_batch_size is None and has_custom_join(relationship):
+            # Keys may be bound as the rows of a compound select
+            dialect = self._dialect(relationship.mapper)
+            max_keys = min(
+                max_keys, _DIALECT_MAX_COMPOUND_SELECTS.get(dialect.name, max_keys)
+            )
+        return max_keys
+
+    def _union_all_max_keys_for(
+        self,
+        relationship: RelationshipProperty,
+        window: _PageWindow,
+        where: Criteria = (),
+        ordering: Ordering = (),
+    ) -> int:
+        """
+        Return the largest number of parent keys paginated by a single
+        UNION ALL statement, which has one select per key
+        """
+        dialect = self._dialect(relationship.mapper)
+        key_size = len(relationship_local_columns(relationship))
+        # Each select binds the key (twice with custom joins), the page bounds,
+        # criteria values and cursor row lookups
+        params = key_size * (2 if has_custom_join(relationship) else 1) + 2
+        params += sum(
+            len(value) if isinstance(value, (list, tuple)) else 1
+            for _, _, value in where
+        )
+        if window.cursor is not None:
+            params += 4 * len(self._order_by(relationship, window, ordering))
+        max_params = _DIALECT_MAX_BIND_PARAMS.get(
+            dialect.name, _DEFAULT_MAX_BIND_PARAMS
+        )
+        max_selects = _DIALECT_MAX_COMPOUND_SELECTS.get(dialect.name, max_params)
+        return max(min(max_selects, (max_params - _RESERVED_BIND_PARAMS) // params), 1)
+
+    def _max_keys_for(self, mapper: Mapper, key_size: int) -> int:
+        """
+        Return the largest number of keys of `key_size` columns bound
+        by a single statement querying `mapper`
+        """
+        if self.max_batch_size is not None:
+            return self.max_batch_size
+        dialect = self._dialect(mapper)
+        max_params = _DIALECT_MAX_BIND_PARAMS.get(
+            dialect.name, _DEFAULT_MAX_BIND_PARAMS
+        )
+        # Each key is bound once per column
+        return max((max_params - _RESERVED_BIND_PARAMS) // key_size, 1)
 
-    def loader_for(self, relationship: RelationshipProperty) -> DataLoader:
+    def _attach(self, value: Any) -> Any:
         """
-        Retrieve or create a DataLoader for the given relationship
+        Merge an object loaded by another session into the request session,
+        returning the instance already in its identity map if any
         """
+        if inspect(value, raiseerr=False) is None:
+            return value
+        return self.session.sync_session.merge(value, load=False)
+
+    async def _execute_in_new_session(self, statement: Select) -> List[Row]:
+        # Use a dedicated session (and pooled connection),
+        # so that statements can run concurrently
+        assert self._sessionmaker is not None
+        async with self._sessionmaker() as session:
+            return (await session.execute(statement)).all()
+
+    async def _execute(self, statement: Select) -> List[Sequence[Any]]:
+        if not self.concurrent:
+            # An AsyncSession can't run statements concurrently
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                return (await self.session.execute(statement)).all()
+
+        async def execute() -> List[Row]:
+            if self.max_concurrency is None:
+                return await self._execute_in_new_session(statement)
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            async with self._semaphore:
+                return await self._execute_in_new_session(statement)
+
+        if self.coalescer is None:
+            rows = await execute()
+        else:
+            key = self.coalescer.key_for(self.session.get_bind(), statement)
+            rows = await self.coalescer.execute(key, execute)
+        # Rows may be shared with other requests: merge copies of the objects
+        return [tuple([self._attach(value) for value in row]) for row in rows]
+
+    async def count(self, selectable: Select) -> int:
+        """
+        Count the rows of a query, possibly concurrently with other statements
+        """
+        rows = await self._execute(count_statement(selectable))
+        return rows[0][0]
+
+    async def _gather(self, *aws: Awaitable[Any]) -> List[Any]:
+        """
+        Run awaitables concurrently if possible, and one after the other
+        otherwise, as a session can't run statements concurrently
+        """
+        if self.concurrent:
+            return list(await asyncio.gather(*aws))
+        return [await aw for aw in aws]
+
+    @staticmethod
+    def _supports_lateral(dialect: Dialect) -> bool:
+        if dialect.name == "postgresql":
+            return True
+        if dialect.name == "mysql" and not getattr(dialect, "is_mariadb", False):
+            version = dialect.server_version_info
+            return version is not None and version >= (8, 0, 14)
+        return False
+
+    def _pagination_strategy_for(
+        self, relationship: RelationshipProperty, batch_size: int
+    ) -> PaginationStrategy:
+        """
+        Pick the strategy used to load pages of the given relationship
+        for `batch_size` parents
+        """
+        if self.pagination_strategy is not None:
+            return self.pagination_strategy
+        if batch_size <= self.union_all_max_keys:
+            return PaginationStrategy.UNION_ALL
+        if self._supports_lateral(self._dialect(relationship.mapper)):
+            return PaginationStrategy.LATERAL
+        return PaginationStrategy.WINDOW
+
+    @staticmethod
+    def _load_only_keys(
+        relationship: RelationshipProperty, projection: FrozenSet[str]
+    ) -> List[str]:
+        """
+        Complete a projection with the columns the loader itself relies on:
+        primary key, remote keys and polymorphic discriminator
+        """
+        related_mapper: Mapper = relationship.mapper
+        columns = list(related_mapper.primary_key)
+        columns.extend(
+            remote
+            for _, remote in relationship_key_pairs(relationship)
+            if remote.table in related_mapper.tables
+        )
+        if related_mapper.polymorphic_on is not None:
+            columns.append(related_mapper.polymorphic_on)
+        keys = set(projection)
+        for column in columns:
+            keys.add(related_mapper.get_property_by_column(column).key)
+        return sorted(keys)
+
+    @staticmethod
+    def _base_query(
+        relationship: RelationshipProperty,
+        load_only_keys: Optional[List[str]],
+        subquery: bool = False,
+        where: Criteria = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+    ) -> Select:
+        """
+        Select related objects matching `where` criteria, joining
+        the association table of many-to-many relationships.
+
+        When the query is meant to be used as a `subquery`, projected columns
+        are selected explicitly so that the others never leave the database.
+
+        Columns of `polymorphic` subclasses of the related model are selected
+        along with the related model ones (see `with_polymorphic`).
+        """
+        related_model = relationship.entity.entity
+        if polymorphic:
+            query = select(_with_polymorphic(related_model, polymorphic))
+        elif subquery and load_only_keys is not None:
+            query = select(*[getattr(related_model, k) for k in load_only_keys])
+        else:
+            query = select(related_model)
+            if load_only_keys is not None:
+                query = query.options(
+                    load_only(*[getattr(related_model, k) for k in load_only_keys])
+                )
+        if relationship.secondary is not None:
+            query = query.join(relationship.secondary, relationship.secondaryjoin)
+        if where:
+            query = query.where(*criteria_clauses(related_model, where))
+        return query
+
+    @staticmethod
+    def _key_labels(key_columns: Sequence[Any]) -> List[Any]:
+        """
+        Key columns, labeled to be selected along with related objects
+        and group them by parent
+        """
+        return [column.label(f"key_{i}") for i, column in enumerate(key_columns)]
+
+    def _parent_keys(
+        self, relationship: RelationshipProperty, keys: List[Tuple]
+    ) -> Any:
+        """
+        FROM clause of the distinct `keys`, with `key_i` columns.
+
+        Keys are bound as a VALUES list, or as literal rows of a UNION ALL
+        on dialects without named VALUES lists, so that the parent table
+        is never read.
+        """
+        local_columns = relationship_local_columns(relationship)
+        keys = list(dict.fromkeys(keys))
+        if self._dialect(relationship.parent).name in _VALUES_DIALECTS:
+            return expression.values(
+                *[
+                    expression.column(f"key_{i}", local.type)
+                    for i, local in enumerate(local_columns)
+                ],
+                name="parent_keys",
+            ).data(keys)
+        rows = [
+            select(
+                *[
+                    literal(value, local.type).label(f"key_{i}")
+                    for i, (value, local) in enumerate(zip(key, local_columns))
+                ]
+            )
+            for key in keys
+        ]
+        if len(rows) == 1:
+            return rows[0].subquery("parent_keys")
+        return union_all(*rows).subquery("parent_keys")
+
+    @staticmethod
+    def _join_condition(
+        relationship: RelationshipProperty, key_columns: Sequence[Any]
+    ) -> ColumnElement:
+        """
+        Condition joining related rows to a parent key, given as expressions
+        in the order of `relationship_local_columns`.
+
+        Custom join conditions are kept whole, with their parent columns
+        replaced by the key expressions, like lazy loads bind them.
+        """
+        if not has_custom_join(relationship):
+            return and_(
+                *[
+                    remote == key_column
+                    for (_, remote), key_column in zip(
+                        relationship_key_pairs(relationship), key_columns
+                    )
+                ]
+            )
+        lazywhere, bind_to_col, _ = relationship._join_condition.create_lazy_clause()
+        local_columns = relationship_local_columns(relationship)
+
+        def replace(element: Any) -> Any:
+            if isinstance(element, BindParameter) and element.key in bind_to_col:
+                column = bind_to_col[element.key]
+                for local, key_column in zip(local_columns, key_columns):
+                    if local.compare(column):
+                        return key_column
+            return None
+
+        return visitors.replacement_traverse(lazywhere, {}, replace)
+
+    def _for_keys(
+        self, relationship: RelationshipProperty, query: Select, keys: List[Tuple]
+    ) -> Tuple[Select, List[Any]]:
+        """
+        Restrict `query` to rows related to `keys`, returning it along with
+        the columns holding the key of the parent of each row.
+
+        Rows are filtered on their remote key columns, unless the relationship
+        has a custom join: the query is then joined to the parent keys,
+        so that every criteria of the join applies.
+        """
+        if has_custom_join(relationship):
+            parent_keys = self._parent_keys(relationship, keys)
+            key_columns = list(parent_keys.c)
+            query = query.join(
+                parent_keys, self._join_condition(relationship, key_columns)
+            )
+            return query, key_columns
+        remotes = [remote for _, remote in relationship_key_pairs(relationship)]
+        return query.where(tuple_(*remotes).in_(keys)), remotes
+
+    def _order_by(
+        self,
+        relationship: RelationshipProperty,
+        window: Optional[_PageWindow],
+        ordering: Ordering = (),
+    ) -> List[Any]:
+        """
+        Order related rows by `ordering`, falling back to the relationship
+        `order_by`, with the primary key as a tie-breaker (unless it is
+        already ordered by last). Directions are reversed when paginating
+        backward.
+        """
+        related_mapper: Mapper = relationship.mapper
+        pk = related_mapper.primary_key[0]
+        if ordering:
+            clauses = ordering_clauses(
+                relationship.entity.entity,
+                ordering,
+                self._dialect(related_mapper).name,
+            )
+        else:
+            clauses = list(relationship.order_by or ())
+        if not clauses or not _ordered_column(clauses[-1]).compare(pk):
+            clauses.append(related_mapper.get_property_by_column(pk))
+        if window is not None and window.backward:
+            clauses = [_reverse_order(clause) for clause in clauses]
+        return clauses
+
+    def _keyset_condition(
+        self, relationship: RelationshipProperty, order_by: List[Any], cursor: Tuple
+    ) -> ColumnElement:
+        """
+        Keep related rows past the cursor row in `order_by` order (as returned
+        by `_order_by`): rows equal to the cursor row on leading columns, and
+        past it on the next one. NULL values are placed like ORDER BY does.
+
+        Values of the cursor row are looked up by primary key with scalar
+        subqueries, except for the primary key tie-breaker.
+        """
+        related_mapper: Mapper = relationship.mapper
+        pk = related_mapper.primary_key[0]
+        dialect_name = self._dialect(related_mapper).name
+        conditions = []
+        equal: List[Any] = []
+        for i, clause in enumerate(order_by):
+            descending, nulls_first = _order_direction(clause)
+            column = _ordered_column(asc(clause))
+            if i == len(order_by) - 1:
+                # The primary key tie-breaker is never NULL
+                past = column < cursor[0] if descending else column > cursor[0]
+                conditions.append(and_(*equal, past))
+                break
+            value = select(column).where(pk == cursor[0]).scalar_subquery()
+            past = column < value if descending else column > value
+            if nulls_first is None:
+                nulls_first = nulls_first_by_default(dialect_name, descending)
+            if nulls_first:
+                past = or_(past, and_(value.is_(None), column.is_not(None)))
+            else:
+                past = or_(past, and_(value.is_not(None), column.is_(None)))
+            conditions.append(and_(*equal, past))
+            equal.append(or_(column == value, and_(column.is_(None), value.is_(None))))
+        return or_(*conditions)
+
+    def _page_query(
+        self,
+        relationship: RelationshipProperty,
+        load_only_keys: Optional[List[str]],
+        window: _PageWindow,
+        order_by: List[Any],
+        where: Criteria,
+        polymorphic: FrozenSet[type],
+    ) -> Select:
+        """
+        Base query of paginated statements, only selecting rows past
+        the keyset cursor of `window`, if any
+        """
+        query = self._base_query(
+            relationship,
+            load_only_keys,
+            subquery=True,
+            where=where,
+            polymorphic=polymorphic,
+        )
+        if window.cursor is not None:
+            query = query.where(
+                self._keyset_condition(relationship, order_by, window.cursor)
+            )
+        return query
+
+    @staticmethod
+    def _aliased_statement(
+        relationship: RelationshipProperty,
+        subquery: Any,
+        load_only_keys: Optional[List[str]],
+        *columns: Any,
+        polymorphic: FrozenSet[type] = frozenset(),
+    ) -> Select:
+        """
+        Select related objects from a subquery, along with `columns`
+        """
+        related_model = relationship.entity.entity
+        if polymorphic:
+            # the subquery holds the columns of subclasses
+            related_alias = _with_polymorphic(related_model, polymorphic, subquery)
+        else:
+            # use aliased to construct orm instances from subquery results
+            related_alias = aliased(related_model, subquery)
+        statement = select(related_alias, *columns)
+        if load_only_keys is not None:
+            statement = statement.options(
+                load_only(*[getattr(related_alias, k) for k in load_only_keys])
+            )
+        return statement
+
+    @staticmethod
+    def _total_count_columns(total_count: bool) -> List[Any]:
+        """
+        Count related rows of a single parent, before LIMIT is applied
+        """
+        if not total_count:
+            return []
+        return [over(func.count()).label("total_count")]
+
+    @staticmethod
+    def _page_columns(subquery: Any, total_count: bool) -> List[Any]:
+        """
+        Columns selected from a paginated subquery along with related objects
+        """
+        columns = [subquery.c.group_num]
+        if total_count:
+            columns.append(subquery.c.total_count)
+        return columns
+
+    def _windowed_statement(
+        self,
+        relationship: RelationshipProperty,
+        keys: List[Tuple],
+        window: _PageWindow,
+        load_only_keys: Optional[List[str]],
+        total_count: bool = False,
+        where: Criteria = (),
+        ordering: Ordering = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+    ) -> Select:
+        """
+        Build a statement fetching the rows of `window` for every parent at once.
+
+        Related rows are numbered for each parent (using `row_number()`),
+        on which a where clause selects rows around the requested page.
+        Rows just before and after the page are kept to know whether
+        there are previous/next pages.
+
+        With `total_count`, related rows are also counted for each parent
+        (using `count(*)` over the same partition).
+        """
+        order_by = self._order_by(relationship, window, ordering)
+        query, parent_columns = self._for_keys(
+            relationship,
+            self._page_query(
+                relationship, load_only_keys, window, order_by, where, polymorphic
+            ),
+            keys,
+        )
+        # Add a column to enumerate related objects for each parent
+        group_num = over(
+            func.row_number(), partition_by=parent_columns, order_by=order_by
+        ).label("group_num")
+        columns = [*self._key_labels(parent_columns), group_num]
+        if total_count:
+            columns.append(
+                over(func.count(), partition_by=parent_columns).label("total_count")
+            )
+        query_a = query.add_columns(*columns).cte("base_query")
+        key_columns = [query_a.c[f"key_{i}"] for i in range(len(parent_columns))]
+        statement = self._aliased_statement(
+            relationship,
+            query_a,
+            load_only_keys,
+            *key_columns,
+            *self._page_columns(query_a, total_count),
+            polymorphic=polymorphic,
+        ).order_by(query_a.c.group_num)
+        if window.lower > 1:
+            statement = statement.where(query_a.c.group_num >= window.lower)
+        return statement.where(query_a.c.group_num <= window.upper)
+
+    def _lateral_statement(
+        self,
+        relationship: RelationshipProperty,
+        keys: List[Tuple],
+        window: _PageWindow,
+        load_only_keys: Optional[List[str]],
+        total_count: bool = False,
+        where: Criteria = (),
+        ordering: Ordering = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+    ) -> Select:
+        """
+        Build a statement fetching the rows of `window` for every parent at once,
+        joining each parent key to a `LATERAL` subquery ordered and limited
+        to its own page.
+
+        Unlike the window strategy, only rows of the page (and the ones around
+        it) are read for each parent, instead of every related rows.
+        """
+        parent_keys = self._parent_keys(relationship, keys)
+        order_by = self._order_by(relationship, window, ordering)
+        # row_number() is computed before LIMIT,
+        # so it gives the position of the row among all related rows
+        group_num = over(func.row_number(), order_by=order_by).label("group_num")
+        page = (
+            self._page_query(
+                relationship, load_only_keys, window, order_by, where, polymorphic
+            )
+            .add_columns(group_num, *self._total_count_columns(total_count))
+            .where(self._join_condition(relationship, list(parent_keys.c)))
+            .order_by(*order_by)
+            .offset(window.lower - 1)
+            .limit(window.upper - window.lower + 1)
+            .lateral("page")
+        )
+        return (
+            self._aliased_statement(
+                relationship,
+                page,
+                load_only_keys,
+                *parent_keys.c,
+                *self._page_columns(page, total_count),
+                polymorphic=polymorphic,
+            )
+            .select_from(parent_keys)
+            .join(page, true())
+            .order_by(page.c.group_num)
+        )
+
+    def _union_all_statement(
+        self,
+        relationship: RelationshipProperty,
+        keys: List[Tuple],
+        window: _PageWindow,
+        load_only_keys: Optional[List[str]],
+        total_count: bool = False,
+        where: Criteria = (),
+        ordering: Ordering = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+    ) -> Select:
+        """
+        Build a statement fetching the rows of `window` for every parent at once,
+        using one ordered and limited `SELECT` per parent key,
+        combined with `UNION ALL`.
+        """
+        local_columns = relationship_local_columns(relationship)
+        remotes = [remote for _, remote in relationship_key_pairs(relationship)]
+        custom_join = has_custom_join(relationship)
+        order_by = self._order_by(relationship, window, ordering)
+        # row_number() is computed before LIMIT,
+        # so it gives the position of the row among all related rows
+        group_num = over(func.row_number(), order_by=order_by).label("group_num")
+        query = self._page_query(
+            relationship, load_only_keys, window, order_by, where, polymorphic
+        )
+        branch_queries = []
+        for key in keys:
+            values = [
+                literal(value, local.type) for value, local in zip(key, local_columns)
+            ]
+            branch_queries.append(
+                query.add_columns(
+                    # Remote columns don't hold parent keys with custom joins
+                    *self._key_labels(values if custom_join else remotes),
+                    group_num,
+                    *self._total_count_columns(total_count),
+                ).where(self._join_condition(relationship, values))
+            )
+        branches = [
+            # Wrap limited selects in a subquery,
+            # as some dialects (e.g. SQLite) forbid LIMIT in compound members
+            select(
+                branch_query.order_by(*order_by)
+                .offset(window.lower - 1)
+                .limit(window.upper - window.lower + 1)
+                .subquery()
+            )
+            for branch_query in branch_queries
+        ]
+        page = union_all(*branches).subquery("page")
+        key_columns = [page.c[f"key_{i}"] for i in range(len(local_columns))]
+        return self._aliased_statement(
+            relationship,
+            page,
+            load_only_keys,
+            *key_columns,
+            *self._page_columns(page, total_count),
+            polymorphic=polymorphic,
+        ).order_by(page.c.group_num)
+
+    def _aggregate_statement(
+        self,
+        relationship: RelationshipProperty,
+        keys: List[Tuple],
+        aggregates: Sequence[Tuple[str, str]] = (),
+        where: Criteria = (),
+    ) -> Select:
+        """
+        Count related rows of every parent matching `where` criteria,
+        and compute `aggregates`, `(function name, column attribute key)`
+        tuples, over them
+        """
+        related_model = relationship.entity.entity
+        statement = select(
+            func.count(),
+            *[
+                getattr(func, function)(getattr(related_model, key))
+                for function, key in aggregates
+            ],
+        ).select_from(related_model)
+        if relationship.secondary is not None:
+            statement = statement.join(
+                relationship.secondary, relationship.secondaryjoin
+            )
+        if where:
+            statement = statement.where(*criteria_clauses(related_model, where))
+        statement, key_columns = self._for_keys(relationship, statement, keys)
+        return statement.add_columns(*self._key_labels(key_columns)).group_by(
+            *key_columns
+        )
+
+    async def _aggregate(
+        self,
+        relationship: RelationshipProperty,
+        keys: List[Tuple],
+        aggregates: Sequence[Tuple[str, str]] = (),
+        where: Criteria = (),
+    ) -> Dict[Tuple, Tuple]:
+        """
+        Return `(count, *aggregates)` tuples by parent key, for parents
+        having related objects, running one statement per batch of parents
+        """
+        max_batch_size = self.max_batch_size_for(relationship)
+        loaded = await self._gather(
+            *[
+                self._execute(
+                    self._aggregate_statement(
+                        relationship, keys[i : i + max_batch_size], aggregates, where
+                    )
+                )
+                for i in range(0, len(keys), max_batch_size)
+            ]
+        )
+        key_size = len(relationship_local_columns(relationship))
+        return {
+            tuple(row[-key_size:]): tuple(row[:-key_size])
+            for rows in loaded
+            for row in rows
+        }
+
+    def _tree_statement(
+        self, relationship: RelationshipProperty, keys: List[Tuple], depth: int
+    ) -> Select:
+        """
+        Build a statement fetching objects related to `keys` through
+        a self-referential relationship, and the objects related to these,
+        down to `depth` levels, with a recursive CTE.
+
+        Rows are `(related object, *parent key, level)`.
+        """
+        related_mapper: Mapper = relationship.mapper
+        pairs = relationship_key_pairs(relationship)
+        remotes = [remote for _, remote in pairs]
+        # Each row carries its own key, to find the rows of the next level
+        columns = [
+            *[
+                column.label(f"pk_{i}")
+                for i, column in enumerate(related_mapper.primary_key)
+            ],
+            *self._key_labels(remotes),
+            *[local.label(f"local_{i}") for i, (local, _) in enumerate(pairs)],
+        ]
+        tree = (
+            select(*columns, literal(1).label("level"))
+            .where(tuple_(*remotes).in_(keys))
+            .cte("tree", recursive=True)
+        )
+        tree = tree.union_all(
+            select(*columns, (tree.c.level + 1).label("level")).where(
+                *[remote == tree.c[f"local_{i}"] for i, remote in enumerate(remotes)],
+                tree.c.level < depth,
+            )
+        )
+        return (
+            select(
+                relationship.entity.entity,
+                *[tree.c[f"key_{i}"] for i in range(len(remotes))],
+                tree.c.level,
+            )
+            .join(
+                tree,
+                and_(
+                    *[
+                        column == tree.c[f"pk_{i}"]
+                        for i, column in enumerate(related_mapper.primary_key)
+                    ]
+                ),
+            )
+            .order_by(*self._order_by(relationship, None))
+        )
+
+    def _proxy_query(
+        self,
+        first: RelationshipProperty,
+        second: RelationshipProperty,
+        keys: List[Tuple],
+        *columns: Any,
+    ) -> Tuple[Select, List[Any]]:
+        """
+        Select `columns` over the objects related through `second` to the
+        objects related through `first` to parents of `keys`, joining both
+        relationships. Return the query along with the columns holding
+        the key of the parent of each row.
+        """
+        in_between_model = first.entity.entity
+        query = select(*columns).select_from(in_between_model)
+        if first.secondary is not None:
+            query = query.join(first.secondary, first.secondaryjoin)
+        query = query.join(getattr(in_between_model, second.key))
+        return self._for_keys(first, query, keys)
+
+    def _proxy_statement(
+        self,
+        first: RelationshipProperty,
+        second: RelationshipProperty,
+        keys: List[Tuple],
+        window: Optional[_PageWindow],
+        total_count: bool = False,
+    ) -> Select:
+        """
+        Build a statement fetching the objects of an association proxy
+        (see `_proxy_query`) for every parent at once, ordered like
+        the intermediate objects, then like the objects of each.
+
+        With a `window`, rows are numbered for each parent, and only rows
+        around the page are kept, like with the window strategy.
+        """
+        query, key_columns = self._proxy_query(
+            first, second, keys, second.entity.entity
+        )
+        order_by = [
+            *(first.order_by or ()),
+            *first.mapper.primary_key,
+            *(second.order_by or ()),
+            *second.mapper.primary_key,
+        ]
+        if window is None:
+            return query.add_columns(*self._key_labels(key_columns)).order_by(*order_by)
+        if window.backward:
+            order_by = [_reverse_order(clause) for clause in order_by]
+        columns = [
+            *self._key_labels(key_columns),
+            over(func.row_number(), partition_by=key_columns, order_by=order_by).label(
+                "group_num"
+            ),
+        ]
+        if total_count:
+            columns.append(
+                over(func.count(), partition_by=key_columns).label("total_count")
+            )
+        page = query.add_columns(*columns).subquery("page")
+        statement = self._aliased_statement(
+            second,
+            page,
+            None,
+            *[page.c[f"key_{i}"] for i in range(len(key_columns))],
+            *self._page_columns(page, total_count),
+        ).order_by(page.c.group_num)
+        if window.lower > 1:
+            statement = statement.where(page.c.group_num >= window.lower)
+        return statement.where(page.c.group_num <= window.upper)
+
+    async def _load_proxy_batch(
+        self,
+        first: RelationshipProperty,
+        second: RelationshipProperty,
+        window: Optional[_PageWindow],
+        keys: List[Tuple],
+        total_count: bool = False,
+    ) -> List[Any]:
+        """
+        Load the objects of an association proxy for all `keys` sharing
+        the same page window, in a single statement
+        """
+        rows = await self._execute(
+            self._proxy_statement(first, second, keys, window, total_count)
+        )
+        key_size = len(relationship_local_columns(first))
+        grouped_keys: Mapping[Tuple, List[Any]] = defaultdict(list)
+        for row in rows:
+            grouped_keys[tuple(row[1 : key_size + 1])].append(
+                (row[0], *row[key_size + 1 :])
+            )
+        if not first.uselist and not second.uselist:
+            return [
+                grouped_keys[key][0][0] if grouped_keys[key] else None for key in keys
+            ]
+        pages = [self._page(window, grouped_keys[key]) for key in keys]
+        uncounted = [key for key, page in zip(keys, pages) if page.total_count is None]
+        if total_count and uncounted:
+            query, key_columns = self._proxy_query(
+                first, second, uncounted, func.count()
+            )
+            counts = {
+                tuple(row[1:]): row[0]
+                for row in await self._execute(
+                    query.add_columns(*self._key_labels(key_columns)).group_by(
+                        *key_columns
+                    )
+                )
+            }
+            for key, page in zip(keys, pages):
+                if page.total_count is None:
+                    page.total_count = counts.get(key, 0)
+        return pages
+
+    async def _load_tree(
+        self, relationship: RelationshipProperty, keys: List[Tuple], depth: int
+    ) -> None:
+        """
+        Load related objects of all `keys`, `depth` levels deep, in a single
+        statement. The results of `keys`, and of every object above the last
+        level, are recorded as known and primed into loaders.
+        """
+        rows = await self._execute(self._tree_statement(relationship, keys, depth))
+        key_size = len(relationship_key_pairs(relationship))
+        related: Mapping[Tuple, List[Any]] = defaultdict(list)
+        # Keys whose related objects are all loaded
+        complete = dict.fromkeys(keys)
+        for obj, *key, level in rows:
+            objects = related[tuple(key[:key_size])]
+            # Cycles reach the same objects again
+            if not any(obj is other for other in objects):
+                objects.append(obj)
+            if level < depth:
+                complete[relationship_key(relationship, obj)] = None
+        for key in complete:
+            objects = related[key]
+            if relationship.uselist:
+                value: Any = PagingList(objects, total_count=len(objects))
+                self._prime_reverse(relationship, key, objects)
+            else:
+                value = objects[0] if objects else None
+            self._prime(relationship, key, value)
+
+    @staticmethod
+    def _page(window: Optional[_PageWindow], rows: Sequence[Any]) -> PagingList:
+        """
+        Build the page of a single parent, trimming extra rows that were
+        fetched for has_next/has_previous.
+
+        Rows are `(obj, group_num[, total_count])` tuples.
+        """
+        if window is None or not rows:
+            return PagingList(
+                [row[0] for row in rows],
+                total_count=len(rows) if window is None else None,
+            )
+
+        page_info = PageInfo.empty_page()
+        page = PagingList()
+        if len(rows[0]) > 2:
+            page.total_count = rows[0][2]
+
+        for obj, group_num, *_ in rows:
+            if group_num <= window.after:
+                page_info.has_previous_page = True
+            elif group_num > window.after + window.first:
+                page_info.has_next_page = True
+            else:
+                page.append(obj)
+        if window.cursor is not None:
+            # Like sqlakeyset, the cursor row is assumed to precede the page
+            page_info.has_previous_page = True
+
+        if window.backward:
+            # Rows were numbered from the end
+            page_info.has_previous_page, page_info.has_next_page = (
+                page_info.has_next_page,
+                page_info.has_previous_page,
+            )
+            page.reverse()
+
+        if page:
+            page_info.start_cursor = cursor_from_obj(page[0])
+            page_info.end_cursor = cursor_from_obj(page[-1])
+
+        page.set_page_info(page_info)
+        return page
+
+    @staticmethod
+    def _counted_page(window: Optional[_PageWindow], count: int) -> PagingList:
+        """
+        Build an empty page of a single parent having `count` related objects,
+        with the page info `_page` would give to the page of `window`
+        """
+        page = PagingList(total_count=count)
+        if window is None or count < window.lower:
+            return page
+
+        page_info = PageInfo.empty_page()
+        page_info.has_previous_page = window.after >= 1
+        page_info.has_next_page = count > window.after + window.first
+        if window.backward:
+            page_info.has_previous_page, page_info.has_next_page = (
+                page_info.has_next_page,
+                page_info.has_previous_page,
+            )
+        page.set_page_info(page_info)
+        return page
+
+    @staticmethod
+    def _targets_primary_key(relationship: RelationshipProperty) -> bool:
+        """
+        Whether relationship keys are primary keys of related objects
+        """
+        if (
+            relationship.direction != MANYTOONE
+            or relationship.secondary is not None
+            or has_custom_join(relationship)
+        ):
+            return False
+        remotes = {remote for _, remote in relationship.local_remote_pairs}
+        return remotes == set(relationship.mapper.primary_key)
+
+    @staticmethod
+    def _primary_key_for(relationship: RelationshipProperty, key: Tuple) -> Tuple:
+        """
+        Primary key of the object a relationship key targets,
+        for relationships targeting primary keys
+        """
+        values = {
+            remote: value
+            for (_, remote), value in zip(relationship.local_remote_pairs, key)
+        }
+        return tuple(values[column] for column in relationship.mapper.primary_key)
+
+    def _from_identity_map(
+        self,
+        relationship: RelationshipProperty,
+        key: Tuple,
+        required_keys: List[str],
+    ) -> Optional[Any]:
+        """
+        Return the object identified by `key` if it is already in the session
+        identity map, with all `required_keys` attributes loaded.
+
+        Many-to-one relationships targeting the primary key of related objects
+        are looked up here first, so that only missing objects are queried.
+        """
+        mapper: Mapper = relationship.mapper
+        identity_key = mapper.identity_key_from_primary_key(
+            list(self._primary_key_for(relationship, key))
+        )
+        obj = self.session.sync_session.identity_map.get(identity_key)
+        if obj is None or not self._is_loaded(obj, required_keys):
+            return None
+        return obj
+
+    @staticmethod
+    def _is_loaded(obj: Any, required_keys: List[str]) -> bool:
+        """
+        Whether `obj` can be used without emitting lazy loads
+        on `required_keys` attributes
+        """
+        state = inspect(obj)
+        if state.expired or state.deleted or state.was_deleted:
+            return False
+        return not state.unloaded.intersection(required_keys)
+
+    @staticmethod
+    def _required_keys(
+        relationship: RelationshipProperty, load_only_keys: Optional[List[str]]
+    ) -> List[str]:
+        """
+        Attributes that objects loaded for `relationship` must have loaded
+        """
+        if load_only_keys is not None:
+            return load_only_keys
+        return [
+            prop.key for prop in relationship.mapper.column_attrs if not prop.deferred
+        ]
+
+    def _prime(
+        self, relationship: RelationshipProperty, key: Tuple, value: Any
+    ) -> None:
+        """
+        Record `value` as the non-paginated result of `relationship` for `key`,
+        and prime the cache of its loaders that can use it
+        """
+        self._known[relationship][key] = value
+        for loader_key, loader in self._loaders.items():
+            other, projection, _, where, ordering, polymorphic, _ = loader_key
+            # Known results are neither filtered, reordered nor polymorphic
+            if other is relationship and not (where or ordering or polymorphic):
+                self._prime_loader(loader, relationship, projection, key, value)
+
+    def _prime_loader(
+        self,
+        loader: DataLoader,
+        relationship: RelationshipProperty,
+        projection: Optional[FrozenSet[str]],
+        key: Tuple,
+        value: Any,
+    ) -> None:
+        # DataLoader.prime() is not available on every supported
+        # strawberry version, so the cache is filled directly
+        if not loader.cache or (None, key) in loader.cache_map:
+            return
+        required_keys = self._required_keys(
+            relationship,
+            self._load_only_keys(relationship, projection)
+            if projection is not None
+            else None,
+        )
+        objects = value if relationship.uselist else [value]
+        if all(self._is_loaded(obj, required_keys) for obj in objects):
+            future = loader.loop.create_future()
+            future.set_result(value)
+            loader.cache_map[(None, key)] = future
+
+    async def _load_by_primary_key(
+        self,
+        relationship: RelationshipProperty,
+        load_only_keys: Optional[List[str]],
+        keys: List[Tuple],
+    ) -> List[Any]:
+        """
+        Load the objects targeted by a many-to-one relationship for `keys`,
+        along with the objects of the same class other relationships load
+        during the same tick, whatever columns they select
+        """
+        loader = self.primary_key_loader_for(relationship.mapper, load_only_keys)
+        primary_keys = [self._primary_key_for(relationship, key) for key in keys]
+        # Objects cached by an earlier batch may lack some of the columns
+        required_keys = self._required_keys(relationship, load_only_keys)
+        for primary_key in primary_keys:
+            future = loader.cache_map.get(primary_key)
+            if (
+                future is not None
+                and future.done()
+                and not future.exception()
+                and future.result() is not None
+                and not self._is_loaded(future.result(), required_keys)
+            ):
+                del loader.cache_map[primary_key]
+        return list(await loader.load_many(primary_keys))
+
+    def _prime_joined(
+        self,
+        relationship: RelationshipProperty,
+        objects: List[Any],
+        joined: FrozenSet[str],
+    ) -> None:
+        """
+        Prime loaders of the `joined` to-one relationships of related
+        `objects` with the objects loaded along with them
+        """
+        related_mapper: Mapper = relationship.mapper
+        for key in joined:
+            to_one = related_mapper.relationships[key]
+            for obj in objects:
+                state = inspect(obj)
+                if key not in state.dict:
+                    continue
+                to_one_key = relationship_key(to_one, obj)
+                if not any(value is None for value in to_one_key):
+                    self._prime(to_one, to_one_key, state.dict[key])
+
+    def _prime_reverse(
+        self, relationship: RelationshipProperty, key: Tuple, objects: List[Any]
+    ) -> None:
+        """
+        Prime many-to-one loaders of the reverse side of a one-to-many
+        relationship, with the parent of `objects` found in the identity map
+        """
+        if relationship.direction != ONETOMANY or not objects:
+            return
+        for reverse in relationship._reverse_property:
+            if not self._targets_primary_key(reverse):
+                continue
+            parent = self._from_identity_map(reverse, key, [])
+            if parent is not None:
+                self._prime(reverse, relationship_key(reverse, objects[0]), parent)
+
+    async def _load_batch(
+        self,
+        relationship: RelationshipProperty,
+        load_only_keys: Optional[List[str]],
+        window: Optional[_PageWindow],
+        keys: List[Tuple],
+        total_count: bool = False,
+        where: Criteria = (),
+        ordering: Ordering = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+        joined: FrozenSet[str] = frozenset(),
+    ) -> List[Any]:
+        """
+        Load related objects of all `keys` sharing the same page window
+        in a single statement, keeping those matching `where` criteria,
+        sorted by `ordering`, along with the columns of their `polymorphic`
+        subclasses and their `joined` to-one relationships.
+
+        With `total_count`, pages hold the number of related objects of their
+        parent. It is computed by the same statement, except for empty pages
+        and keyset pages, which only read rows past their cursor (counted
+        with a second statement).
+        """
+        if window is not None:
+            # Keyset pages are counted separately
+            page_total_count = total_count and window.cursor is None
+            strategy = self._pagination_strategy_for(relationship, len(keys))
+            if strategy == PaginationStrategy.UNION_ALL:
+                statement = self._union_all_statement(
+                    relationship,
+                    keys,
+                    window,
+                    load_only_keys,
+                    page_total_count,
+                    where,
+                    ordering,
+                    polymorphic,
+                )
+            elif strategy == PaginationStrategy.LATERAL:
+                statement = self._lateral_statement(
+                    relationship,
+                    keys,
+                    window,
+                    load_only_keys,
+                    page_total_count,
+                    where,
+                    ordering,
+                    polymorphic,
+                )
+            else:
+                statement = self._windowed_statement(
+                    relationship,
+                    keys,
+                    window,
+                    load_only_keys,
+                    page_total_count,
+                    where,
+                    ordering,
+                    polymorphic,
+                )
+            self.strategy_stats[(relationship, strategy)] += 1
+        else:
+            statement, key_columns = self._for_keys(
+                relationship,
+                self._base_query(
+                    relationship, load_only_keys, where=where, polymorphic=polymorphic
+                ),
+                keys,
+            )
+            statement = statement.add_columns(*self._key_labels(key_columns))
+            if ordering:
+                statement = statement.order_by(
+                    *self._order_by(relationship, None, ordering)
+                )
+            elif relationship.order_by:
+                statement = statement.order_by(*relationship.order_by)
+
+        if joined:
+            entity = statement.column_descriptions[0]["entity"]
+            statement = statement.options(
+                *[joinedload(getattr(entity, key)) for key in sorted(joined)]
+            )
+
+        rows = await self._execute(statement)
+        if joined:
+            self._prime_joined(relationship, [row[0] for row in rows], joined)
+
+        # Rows are (related object, *parent key, [group_num])
+        key_size = len(relationship_local_columns(relationship))
+        grouped_keys: Mapping[Tuple, List[Any]] = defaultdict(list)
+        for row in rows:
+            grouped_keys[tuple(row[1 : key_size + 1])].append(
+                (row[0], *row[key_size + 1 :])
+            )
+        if relationship.uselist:
+            pages = [self._page(window, grouped_keys[key]) for key in keys]
+            uncounted = [
+                key for key, page in zip(keys, pages) if page.total_count is None
+            ]
+            if total_count and uncounted:
+                counts = await self._aggregate(relationship, uncounted, where=where)
+                for key, page in zip(keys, pages):
+                    if page.total_count is None:
+                        page.total_count = counts.get(key, (0,))[0]
+            return pages
+        else:
+            return [
+                grouped_keys[key][0][0] if grouped_keys[key] else None for key in keys
+            ]
+
+    def loader_for(
+        self,
+        relationship: RelationshipProperty,
+        projection: Optional[FrozenSet[str]] = None,
+        total_count: bool = False,
+        where: Criteria = (),
+        ordering: Ordering = (),
+        polymorphic: FrozenSet[type] = frozenset(),
+        joined: FrozenSet[str] = frozenset(),
+    ) -> DataLoader:
+        """
+        Retrieve or create a DataLoader for the given relationship.
+
+        Keys are `(page_input, relationship_key)` tuples, and values pages of
+        related objects (or the related object of to-one relationships).
+        Loaders are created per combination of arguments, so that batches
+        and caches never mix different loads.
+
+        Args:
+            relationship: The relationship to load.
+            projection: Only load these column attributes on related objects
+                (see `_load_only_keys`), all columns by default.
+            total_count: Make pages hold the number of related objects
+                of their parent (see `PagingList.total_count`).
+            where: Criteria related objects must match
+                (see `filters.criteria_from_where`).
+            ordering: Order of related objects, instead of the relationship
+                `order_by` (see `filters.ordering_from_order_by`).
+            polymorphic: Subclasses of the related model whose columns are
+                loaded by the same statement.
+            joined: Keys of to-one relationships of related objects loaded
+                by the same statement (see `_prime_joined`).
+        """
+        loader_key = (
+            relationship,
+            projection,
+            total_count,
+            where,
+            ordering,
+            polymorphic,
+            joined,
+        )
         try:
-            return self._loaders[relationship]
+            return self._loaders[loader_key]
         except KeyError:
-            related_model = relationship.entity.entity
+            load_only_keys = (
+                self._load_only_keys(relationship, projection)
+                if projection is not None
+                else None
+            )
+            use_identity_map = (
+                self._targets_primary_key(relationship)
+                and not where
+                and not polymorphic
+            )
+            # Objects are then loaded with those of other relationships
+            # targeting the same class
+            by_primary_key = use_identity_map and not joined
+            required_keys = self._required_keys(relationship, load_only_keys)
 
             async def load_fn(keys: List[Tuple]) -> List[Any]:
-                page_input: RelativePageInput = keys[0][0]
+                windows = [_PageWindow.from_page_input(key[0]) for key in keys]
+                results: Dict[Tuple[Optional[_PageWindow], Tuple], Any] = {}
+                batches: Dict[Optional[_PageWindow], Dict[Tuple, None]] = {}
+                cache = self.result_cache
+                if cache is not None and self.session is not None:
+                    session = self.session.sync_session
+                    if not cache.usable_by(session, relationship):
+                        cache = None
+                    else:
+                        generation = cache.generation(relationship)
+                for window, (_, key) in zip(windows, keys):
+                    if use_identity_map and window is None and self.session is not None:
+                        obj = self._from_identity_map(relationship, key, required_keys)
+                        if obj is not None:
+                            results[(window, key)] = obj
+                            continue
+                    if cache is not None:
+                        cached = cache.get(
+                            session,
+                            relationship,
+                            projection,
+                            window,
+                            key,
+                            total_count,
+                            where,
+                            ordering,
+                            polymorphic,
+                            joined,
+                        )
+                        if cached is not None:
+                            results[(window, key)] = cached[0]
+                            if window is None and relationship.uselist:
+                                self._prime_reverse(relationship, key, cached[0])
+                            continue
+                    batches.setdefault(window, {})[key] = None
 
-                keys = [k[1] for k in keys]
-                query = select(related_model).filter(
-                    tuple_(
-                        *[remote for _, remote in relationship.local_remote_pairs]
-                    ).in_(keys)
+                max_batch_size = self.max_batch_size_for(relationship)
+                chunks: List[Tuple[Optional[_PageWindow], List[Tuple]]] = []
+                for window, batch in batches.items():
+                    batch_keys = list(batch)
+                    size = max_batch_size
+                    if (
+                        window is not None
+                        and self._pagination_strategy_for(relationship, len(batch_keys))
+                        == PaginationStrategy.UNION_ALL
+                    ):
+                        size = min(
+                            size,
+                            self._union_all_max_keys_for(
+                                relationship, window, where, ordering
+                            ),
+                        )
+                    for i in range(0, len(batch_keys), size):
+                        chunks.append((window, batch_keys[i : i + size]))
+                loaded = await self._gather(
+                    *[
+                        self._load_by_primary_key(relationship, load_only_keys, chunk)
+                        if by_primary_key and window is None
+                        else self._load_batch(
+                            relationship,
+                            load_only_keys,
+                            window,
+                            chunk,
+                            total_count,
+                            where,
+                            ordering,
+                            polymorphic,
+                            joined,
+                        )
+                        for window, chunk in chunks
+                    ]
                 )
 
-                if page_input:
-                    after = 0
-                    # Create a page_input to get all desired pages in a single one.
-                    # The idea is to group rows by position for each keys.
-                    #
-                    # Given a set of 3 keys, the result order should look like this:
-                    # 1 - row 1 for key 1
-                    # 2 - row 1 for key 2
-                    # 3 - row 1 for key 3
-                    # 4 - row 2 for key 1
-                    # 5 - row 2 for key 2
-                    # .
-                    # .
-                    # n - row n//3 + 1 for key n%3 * (n%3/max(n%3, 1) or 3)
-                    #
-                    # Given this order,
-                    # we can add row count column (using row_number())
-                    # on which a where clause will be used to find rows
-                    # after/before relative position.
-                    if page_input.first is not None:
-                        first = page_input.first
-                        if page_input.after is not None:
-                            after = page_input.after
-                        backward = False
+                for (window, chunk), values in zip(chunks, loaded):
+                    results.update(
+                        ((window, key), value) for key, value in zip(chunk, values)
+                    )
+                    for key, value in zip(chunk, values):
+                        if window is None and relationship.uselist:
+                            self._prime_reverse(relationship, key, value)
+                        if cache is not None:
+                            cache.set(
+                                relationship,
+                                projection,
+                                window,
+                                key,
+                                value,
+                                generation,
+                                total_count,
+                                where,
+                                ordering,
+                                polymorphic,
+                                joined,
+                            )
+                return [
+                    results[(window, key)] for window, (_, key) in zip(windows, keys)
+                ]
 
-                    else:
-                        # mypy
-                        assert page_input.last is not None
+            loader = DataLoader(load_fn=load_fn)
+            if not where and not ordering and not polymorphic:
+                for key, value in self._known[relationship].items():
+                    self._prime_loader(loader, relationship, projection, key, value)
+            self._loaders[loader_key] = loader
+            return loader
+
+    def count_loader_for(
+        self, relationship: RelationshipProperty, where: Criteria = ()
+    ) -> DataLoader:
+        """
+        Retrieve or create a DataLoader counting the objects related
+        through the given relationship, for connections whose edges
+        are not selected.
+
+        Keys are `(page_input, relationship_key)` tuples, like `loader_for`.
+        Pages hold no object, only their `total_count` and page info flags
+        (cursors are left empty). Parents are counted with a single grouped
+        `COUNT` statement, whatever their page window, only counting objects
+        matching `where` criteria. Page inputs with a keyset cursor are not
+        supported, as flags of their pages depend on the cursor row.
+        """
+        try:
+            return self._count_loaders[(relationship, where)]
+        except KeyError:
+
+            async def load_fn(keys: List[Tuple]) -> List[Any]:
+                parent_keys = list(dict.fromkeys(key for _, key in keys))
+                counts = await self._aggregate(relationship, parent_keys, where=where)
+                return [
+                    self._counted_page(
+                        _PageWindow.from_page_input(page_input),
+                        counts.get(key, (0,))[0],
+                    )
+                    for page_input, key in keys
+                ]
+
+            self._count_loaders[(relationship, where)] = DataLoader(load_fn=load_fn)
+            return self._count_loaders[(relationship, where)]
+
+    def aggregate_loader_for(
+        self,
+        relationship: RelationshipProperty,
+        aggregates: FrozenSet[Tuple[str, str]] = frozenset(),
+    ) -> DataLoader:
+        """
+        Retrieve or create a DataLoader computing aggregates over the objects
+        related through the given relationship.
+
+        `aggregates` are `(function name, column attribute key)` tuples,
+        e.g. `("max", "salary")`. Keys are relationship keys, and values are
+        dicts holding the number of related objects under `"count"`, along
+        with the value of each aggregate (None for parents without related
+        objects). A single `GROUP BY` statement is run per batch of parents.
+        """
+        try:
+            return self._aggregate_loaders[(relationship, aggregates)]
+        except KeyError:
+            sorted_aggregates = sorted(aggregates)
+
+            async def load_fn(keys: List[Tuple]) -> List[Any]:
+                values = await self._aggregate(
+                    relationship, list(dict.fromkeys(keys)), sorted_aggregates
+                )
+                empty = (0, *[None for _ in sorted_aggregates])
+                return [
+                    dict(zip(["count", *sorted_aggregates], values.get(key, empty)))
+                    for key in keys
+                ]
+
+            self._aggregate_loaders[(relationship, aggregates)] = DataLoader(
+                load_fn=load_fn
+            )
+            return self._aggregate_loaders[(relationship, aggregates)]
+
+    def primary_key_loader_for(
+        self, mapper: Mapper, load_only_keys: Optional[List[str]] = None
+    ) -> DataLoader:
+        """
+        Retrieve or create a DataLoader of objects of a mapped class,
+        by primary key.
+
+        Keys are primary key tuples, and values the objects (or None).
+        Loaders of every many-to-one relationship targeting the primary key
+        of `mapper` (e.g. `created_by`, `assignee`...) share it, so that
+        the objects they load during the same tick are fetched by a single
+        statement. Its next batch loads `load_only_keys` columns, along with
+        the columns requested by other callers, or all columns if not given.
+        """
+        pending = self._primary_key_projections
+        if load_only_keys is None or pending.get(mapper, set()) is None:
+            pending[mapper] = None
+        else:
+            pending.setdefault(mapper, set()).update(load_only_keys)
+        try:
+            return self._primary_key_loaders[mapper]
+        except KeyError:
+            model = mapper.class_
+            primary_key = list(mapper.primary_key)
+
+            async def load_fn(keys: List[Tuple]) -> List[Any]:
+                projection = self._primary_key_projections.pop(mapper, None)
+                statement = select(model)
+                if projection is not None:
+                    statement = statement.options(
+                        load_only(*[getattr(model, k) for k in sorted(projection)])
+                    )
+                max_keys = self._max_keys_for(mapper, len(primary_key))
+                loaded = await self._gather(
+                    *[
+                        self._execute(
+                            statement.where(
+                                tuple_(*primary_key).in_(keys[i : i + max_keys])
+                            )
+                        )
+                        for i in range(0, len(keys), max_keys)
+                    ]
+                )
+                objects = {
+                    tuple(mapper.primary_key_from_instance(obj)): obj
+                    for rows in loaded
+                    for (obj,) in rows
+                }
+                return [objects.get(key) for key in keys]
 
-                        first = page_input.last
-                        if page_input.before is not None:
-                            after = abs(page_input.before)
+            self._primary_key_loaders[mapper] = DataLoader(load_fn=load_fn)
+            return self._primary_key_loaders[mapper]
 
-                        backward = True
+    def column_loader_for(self, mapper: Mapper, key: str) -> DataLoader:
+        """
+        Retrieve or create a DataLoader of the values of the column attribute
+        `key` of a mapped class, by primary key.
 
-                    # Add a column to enumerate related objects for each parent
-                    remote_key = relationship.local_remote_pairs[0][1]
-                    related_mapper = related_model.__mapper__
-                    pks = [
-                        related_mapper.get_property_by_column(col)
-                        for col in related_mapper.primary_key
+        Keys are primary key tuples. Values of objects awaited during the same
+        tick are read by a single `SELECT pk, column ... WHERE pk IN (...)`
+        statement, for columns that are deferred or were left out of
+        a projection.
+        """
+        try:
+            return self._column_loaders[(mapper, key)]
+        except KeyError:
+            model = mapper.class_
+            primary_key = list(mapper.primary_key)
+            # Columns of subclasses are read from the join of their tables
+            statement = select(*primary_key, getattr(model, key)).select_from(model)
+
+            async def load_fn(keys: List[Tuple]) -> List[Any]:
+                max_keys = self._max_keys_for(mapper, len(primary_key))
+                loaded = await self._gather(
+                    *[
+                        self._execute(
+                            statement.where(
+                                tuple_(*primary_key).in_(keys[i : i + max_keys])
+                            )
+                        )
+                        for i in range(0, len(keys), max_keys)
                     ]
-                    if backward:
-                        order_by = desc(pks[0])
-                    else:
-                        order_by = pks[0]
-                    group_num = over(
-                        func.row_number(), partition_by=remote_key, order_by=order_by
-                    ).label("group_num")
-                    query_a = query.add_columns(group_num)
-                    query_a = query_a.order_by(group_num, remote_key).cte("base_query")
-
-                    # Final query
-                    # use aliased to construct orm instances from subquery results
-                    statement = select(
-                        aliased(related_model, query_a), literal_column("group_num")
-                    ).order_by("group_num", remote_key.name)
-
-                    extra_firsts = 1
-
-                    if after:
-                        statement = statement.where(
-                            query_a.c.group_num >= max(after - 1, 0)
+                )
+                values = {tuple(row[:-1]): row[-1] for rows in loaded for row in rows}
+                return [values.get(key) for key in keys]
+
+            self._column_loaders[(mapper, key)] = DataLoader(load_fn=load_fn)
+            return self._column_loaders[(mapper, key)]
+
+    def proxy_loader_for(
+        self,
+        first: RelationshipProperty,
+        second: RelationshipProperty,
+        total_count: bool = False,
+    ) -> DataLoader:
+        """
+        Retrieve or create a DataLoader for an association proxy made of
+        two relationships: the objects related through `second` to the
+        objects related through `first`.
+
+        Keys are `(page_input, relationship_key)` tuples, like `loader_for`,
+        relationship keys being those of `first`. Page inputs with a keyset
+        cursor are not supported. Both relationships are joined by a single
+        statement per page window and batch of parents, so that intermediate
+        objects are never loaded, and pages are computed in SQL.
+
+        Values are pages, or objects (or None) when both relationships
+        are to-one. With `total_count`, pages also hold the number of
+        objects of their parent.
+        """
+        loader_key = (first, second, total_count)
+        try:
+            return self._proxy_loaders[loader_key]
+        except KeyError:
+
+            async def load_fn(keys: List[Tuple]) -> List[Any]:
+                windows = [_PageWindow.from_page_input(key[0]) for key in keys]
+                batches: Dict[Optional[_PageWindow], Dict[Tuple, None]] = {}
+                for window, (_, key) in zip(windows, keys):
+                    batches.setdefault(window, {})[key] = None
+                max_batch_size = self.max_batch_size_for(first)
+                chunks: List[Tuple[Optional[_PageWindow], List[Tuple]]] = []
+                for window, batch in batches.items():
+                    batch_keys = list(batch)
+                    for i in range(0, len(batch_keys), max_batch_size):
+                        chunks.append((window, batch_keys[i : i + max_batch_size]))
+                loaded = await self._gather(
+                    *[
+                        self._load_proxy_batch(
+                            first, second, window, chunk, total_count
                         )
-                        extra_firsts += 1
-                    statement = statement.where(
-                        query_a.c.group_num <= first + extra_firsts
+                        for window, chunk in chunks
+                    ]
+                )
+                results: Dict[Tuple[Optional[_PageWindow], Tuple], Any] = {}
+                for (window, chunk), values in zip(chunks, loaded):
+                    results.update(
+                        ((window, key), value) for key, value in zip(chunk, values)
                     )
+                return [
+                    results[(window, key)] for window, (_, key) in zip(windows, keys)
+                ]
 
-                    res = await self.bind.execute(statement)
-                    rows = res.all()
-                else:
-                    if relationship.order_by:
-                        query = query.order_by(*relationship.order_by)
-
-                    res = await self.bind.execute(query)
-                    rows = res.all()
-
-                def group_by_remote_key(row: Any) -> Tuple:
-                    return tuple(
-                        [
-                            getattr(row[0], remote.key)
-                            for _, remote in relationship.local_remote_pairs
-                        ]
-                    )
+            self._proxy_loaders[loader_key] = DataLoader(load_fn=load_fn)
+            return self._proxy_loaders[loader_key]
 
-                def key_page(objects: PagingList) -> PagingList:
-                    """Paginate each list to trim extra rows that were
-                    fetched for has_next/has_previous.
-                    """
-                    if not page_input or not objects:
-                        return PagingList([o[0] for o in objects])
-
-                    page_info = PageInfo.empty_page()
-                    page = PagingList()
-
-                    for obj, group_num in objects:
-                        if group_num <= after:
-                            page_info.has_previous_page = True
-                        elif group_num > after + first:
-                            page_info.has_next_page = True
-                        elif isinstance(obj, tuple):
-                            page.append(obj[0])
-                        else:
-                            page.append(obj)
-
-                    if backward:
-                        page_info.has_previous_page = not page_info.has_previous_page
-                        page_info.has_next_page = not page_info.has_next_page
-                        page.reverse()
-
-                    if page:
-                        page_info.start_cursor = cursor_from_obj(page[0])
-                        page_info.end_cursor = cursor_from_obj(page[-1])
-
-                    page.set_page_info(page_info)
-                    return page
-
-                grouped_keys: Mapping[Tuple, PagingList] = defaultdict(PagingList)
-
-                for row in rows:
-                    grouped_keys[group_by_remote_key(row)].append(row)
-                if relationship.uselist:
-                    return [key_page(grouped_keys[key]) for key in keys]
-                else:
-                    return [
-                        grouped_keys[key][0][0] if grouped_keys[key] else None
-                        for key in keys
+    def tree_loader_for(
+        self, relationship: RelationshipProperty, depth: int
+    ) -> DataLoader:
+        """
+        Retrieve or create a DataLoader for a self-referential relationship
+        (see `is_self_referential`), loading related objects `depth` levels
+        deep with a single recursive statement per batch of parents.
+
+        Keys are relationship keys, and values are the non-paginated results
+        of `loader_for(relationship)`. Loaders of the relationship are primed
+        with the results of the objects loaded on every level but the last,
+        so that resolving nested levels doesn't query the database again.
+        Keys whose results are already known are not loaded again.
+        """
+        try:
+            return self._tree_loaders[(relationship, depth)]
+        except KeyError:
+
+            async def load_fn(keys: List[Tuple]) -> List[Any]:
+                known = self._known[relationship]
+                missing = [key for key in keys if key not in known]
+                max_batch_size = self.max_batch_size_for(relationship)
+                await self._gather(
+                    *[
+                        self._load_tree(
+                            relationship, missing[i : i + max_batch_size], depth
+                        )
+                        for i in range(0, len(missing), max_batch_size)
                     ]
+                )
+                return [known[key] for key in keys]
 
-            self._loaders[relationship] = DataLoader(load_fn=load_fn)
-            return self._loaders[relationship]
+            self._tree_loaders[(relationship, depth)] = DataLoader(load_fn=load_fn)
+            return self._tree_loaders[(relationship, depth)]
@@ -13,6 +13,7 @@ from typing import (
     Callable,
     Dict,
     ForwardRef,
+    FrozenSet,
     Generic,
     Iterable,
     List,
@@ -21,6 +22,7 @@ from typing import (
     NewType,
     Optional,
     Set,
+    Tuple,
     Type,
     TypeVar,
     Union,
@@ -50,21 +52,28 @@ from sqlalchemy import (
     Unicode,
     UnicodeText,
     inspect,
+    select,
 )
 from sqlalchemy.dialects.postgresql import UUID as SQLAlchemyUUID
 from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import (
     MANYTOMANY,
     MANYTOONE,
     ONETOMANY,
+    ColumnProperty,
     Mapper,
     RelationshipProperty,
+    undefer,
 )
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.state import InstanceState
 from sqlalchemy.sql.type_api import TypeEngine
 from strawberry.annotation import StrawberryAnnotation
 from strawberry.types import Info
+from strawberry.types.nodes import Selection
+from strawberry.utils.str_converters import to_camel_case
 
 from strawberry_sqlalchemy_mapper.exc import (
     HybridPropertyNotAnnotated,
@@ -73,6 +82,23 @@ from strawberry_sqlalchemy_mapper.exc import (
     UnsupportedColumnType,
     UnsupportedDescriptorType,
 )
+from strawberry_sqlalchemy_mapper.filters import (
+    EQUALITY_OPERATORS,
+    ORDERING_OPERATORS,
+    Criteria,
+    OrderDirection,
+    Ordering,
+    criteria_from_where,
+    matches,
+    ordering_from_order_by,
+    sort,
+)
+from strawberry_sqlalchemy_mapper.loader import (
+    StrawberrySQLAlchemyLoader,
+    is_self_referential,
+    relationship_key as loader_relationship_key,
+)
+from strawberry_sqlalchemy_mapper.pinned import PinnedTable
 from strawberry_sqlalchemy_mapper.relay import (
     Connection,
     Edge,
@@ -81,6 +107,17 @@ from strawberry_sqlalchemy_mapper.relay import (
     RelativePageInput,
     cursor_from_obj,
 )
+from strawberry_sqlalchemy_mapper.selection import (
+    find_fields,
+    fragment_type_names,
+    iter_fields,
+    nesting_depth,
+    node_selections,
+    projection_for,
+    selects_field,
+    subfield_names,
+    to_one_relationship_keys,
+)
 
 Default = TypeVar("Default")
 
@@ -105,6 +142,41 @@ _IS_GENERATED_RESOLVER_KEY = "_is_generated_resolver"
 _CREATE_INPUT_TYPE_KEY = "CreateInput"
 #: Set on generated types, the strawberry input type used for update mutations
 _UPDATE_INPUT_TYPE_KEY = "UpdateInput"
+#: PageInfo fields that can't be known without loading related objects
+_CURSOR_FIELDS = frozenset(["startCursor", "endCursor"])
+
+
+def _loader_from_context(info: Info) -> StrawberrySQLAlchemyLoader:
+    """
+    The loader of the request, from a dict context or the attribute
+    of a context object
+    """
+    if isinstance(info.context, dict):
+        return info.context["sqlalchemy_loader"]
+    return info.context.sqlalchemy_loader
+
+
+def _aggregate_objects(
+    objects: Iterable[Any], aggregates: Iterable[Tuple[str, str]]
+) -> Dict[Any, Any]:
+    """
+    Compute aggregates over objects already loaded, like
+    `StrawberrySQLAlchemyLoader.aggregate_loader_for` does in SQL
+    """
+    objects = list(objects)
+    values: Dict[Any, Any] = {"count": len(objects)}
+    for function, key in aggregates:
+        items = [getattr(obj, key) for obj in objects]
+        items = [item for item in items if item is not None]
+        if not items:
+            values[(function, key)] = None
+        elif function == "sum":
+            values[(function, key)] = sum(items)
+        elif function == "avg":
+            values[(function, key)] = sum(items) / len(items)
+        else:
+            values[(function, key)] = min(items) if function == "min" else max(items)
+    return values
 
 
 class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
@@ -147,6 +219,20 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
         SQLAlchemyUUID: uuid.UUID,
         VARCHAR: str,
     }
+    #: Names of scalars in <Scalar>Filter inputs, by strawberry type
+    _scalar_names: Dict[Any, str] = {
+        int: "Int",
+        float: "Float",
+        Decimal: "Decimal",
+        datetime: "DateTime",
+        date: "Date",
+        time: "Time",
+        str: "String",
+        bool: "Boolean",
+        uuid.UUID: "UUID",
+    }
+    #: Strawberry types whose filters support ranges
+    _ordered_scalars = frozenset([int, float, Decimal, datetime, date, time, str])
     #: Mapping from sqlalchemy types to strawberry types
     sqlalchemy_type_to_strawberry_type_map: MutableMapping[
         Type[TypeEngine], Union[Type[Any], SkipTypeSentinelT]
@@ -166,6 +252,17 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
     _related_type_models: Set[Type[BaseModelType]]
     #: All interface models that are related to currently mapped types
     _related_interface_models: Set[Type[BaseModelType]]
+    #: Small, immutable models whose rows are kept in memory,
+    #: see `refresh_pinned`
+    pinned_models: Set[Type[BaseModelType]]
+    #: In-memory rows of pinned models, replaced as a whole on refresh
+    pinned_tables: Mapping[Type[BaseModelType], PinnedTable]
+    #: <Model>Aggregate types (and the types of their fields)
+    #: generated by the mapper
+    aggregate_types: Dict[str, Type[Any]]
+    #: <Model>Where inputs (and the <Scalar>Filter inputs of their fields)
+    #: and <Model>OrderBy inputs generated by the mapper
+    filter_types: Dict[str, Type[Any]]
 
     def __init__(
         self,
@@ -181,6 +278,10 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
             Mapping[Type[TypeEngine], Type[Any]]
         ] = None,
         input_bases=None,
+        pinned_models: Optional[Iterable[Type[BaseModelType]]] = None,
+        generate_aggregates: bool = False,
+        generate_filters: bool = False,
+        generate_order_by: bool = False,
     ) -> None:
         if TYPE_CHECKING:
             self.model_to_create_input_name: Callable[[Type[BaseModelType]], str]
@@ -215,6 +316,17 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
         self.input_model_map = {}
         self._related_type_models = set()
         self._related_interface_models = set()
+        self.pinned_models = set(pinned_models or ())
+        self.pinned_tables = {}
+        #: Whether to add a `<relationship>_aggregate` field
+        #: for each uselist relationship
+        self.generate_aggregates = generate_aggregates
+        self.aggregate_types = {}
+        #: Whether to add a `where` argument to uselist relationship fields
+        self.generate_filters = generate_filters
+        #: Whether to add an `order_by` argument to uselist relationship fields
+        self.generate_order_by = generate_order_by
+        self.filter_types = {}
 
         if input_bases is not None:
             if not isinstance(input_bases, tuple):
@@ -307,6 +419,186 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
             setattr(connection_type, _IS_GENERATED_CONNECTION_TYPE_KEY, True)
         return self.connection_types[connection_name]
 
+    def _aggregate_type_for(self, model: Type[BaseModelType]) -> Type[Any]:
+        """
+        Get or create the <Model>Aggregate type of the given related model,
+        with a count and, when the model has suitable columns, sum/avg
+        (numeric columns) and min/max (numeric, string and temporal columns)
+        """
+        type_name = self.model_to_type_or_interface_name(model)
+        aggregate_name = f"{type_name}Aggregate"
+        if aggregate_name in self.aggregate_types:
+            return self.aggregate_types[aggregate_name]
+
+        numeric_fields, comparable_fields = [], []
+        for key, column in inspect(model).columns.items():
+            if isinstance(column.type, (Enum, ARRAY)) or not isinstance(
+                column.type, (Integer, Numeric, String, Date, DateTime, Time)
+            ):
+                continue
+            try:
+                annotation = self._convert_column_to_strawberry_type(
+                    Column(column.type, nullable=True)
+                )
+            except UnsupportedColumnType:
+                continue
+            if annotation is SkipTypeSentinel:
+                continue
+            comparable_fields.append((key, annotation))
+            if isinstance(column.type, (Integer, Numeric)):
+                numeric_fields.append((key, annotation))
+
+        def make_type(name: str, fields: List[Tuple[str, Any]]) -> Type[Any]:
+            self.aggregate_types[name] = strawberry.type(
+                dataclasses.make_dataclass(
+                    name,
+                    [
+                        (key, annotation, dataclasses.field(default=None))
+                        for key, annotation in fields
+                    ],
+                )
+            )
+            return self.aggregate_types[name]
+
+        fields: List[Tuple[str, Any]] = []
+        if numeric_fields:
+            fields.append(("sum", make_type(f"{aggregate_name}Sum", numeric_fields)))
+            fields.append(
+                (
+                    "avg",
+                    make_type(
+                        f"{aggregate_name}Avg",
+                        [(key, Optional[float]) for key, _ in numeric_fields],
+                    ),
+                )
+            )
+        if comparable_fields:
+            min_max_type = make_type(f"{aggregate_name}MinMax", comparable_fields)
+            fields.extend([("min", min_max_type), ("max", min_max_type)])
+        self.aggregate_types[aggregate_name] = strawberry.type(
+            dataclasses.make_dataclass(
+                aggregate_name,
+                [
+                    ("count", int),
+                    *[
+                        (key, Optional[type_], dataclasses.field(default=None))
+                        for key, type_ in fields
+                    ],
+                ],
+            )
+        )
+        return self.aggregate_types[aggregate_name]
+
+    def _scalar_type_for(self, column: Column) -> Optional[Type[Any]]:
+        """
+        Strawberry type of the values of the given column, if it
+        can be filtered or ordered on (i.e. it holds scalar values)
+        """
+        if isinstance(column.type, ARRAY) or not isinstance(
+            column.type,
+            (
+                Integer,
+                Numeric,
+                String,
+                Boolean,
+                Date,
+                DateTime,
+                Time,
+                Enum,
+                SQLAlchemyUUID,
+            ),
+        ):
+            return None
+        try:
+            annotation = self._convert_column_to_strawberry_type(
+                Column(column.type, nullable=False)
+            )
+        except UnsupportedColumnType:
+            return None
+        if annotation is SkipTypeSentinel:
+            return None
+        return annotation
+
+    def _filter_type_for(self, column: Column) -> Optional[Type[Any]]:
+        """
+        Get or create the <Scalar>Filter input of the given column,
+        or None if the column can't be filtered on.
+
+        Filters of all columns support equality, IN and null checks,
+        and those of numeric, string and temporal columns support ranges.
+        """
+        annotation = self._scalar_type_for(column)
+        if annotation is None:
+            return None
+        scalar_name = self._scalar_names.get(annotation, annotation.__name__)
+        filter_name = f"{scalar_name}Filter"
+        if filter_name not in self.filter_types:
+            if annotation in self._ordered_scalars:
+                operators = ORDERING_OPERATORS
+            else:
+                operators = EQUALITY_OPERATORS
+            annotations: Dict[str, Any] = {}
+            namespace: Dict[str, Any] = {"__annotations__": annotations}
+            for name in operators:
+                if name == "in":
+                    # `in` is a python keyword
+                    annotations["in_"] = Optional[List[annotation]]  # type: ignore
+                    namespace["in_"] = strawberry.field(default=None, name="in")
+                else:
+                    annotations[name] = (
+                        Optional[bool] if name == "is_null" else Optional[annotation]
+                    )
+                    namespace[name] = None
+            # Not built with make_dataclass, which would drop the field name of `in`
+            self.filter_types[filter_name] = strawberry.input(
+                type(filter_name, (), namespace)
+            )
+        return self.filter_types[filter_name]
+
+    def _where_type_for(self, model: Type[BaseModelType]) -> Type[Any]:
+        """
+        Get or create the <Model>Where input of the given related model,
+        with a filter for each column that can be filtered on.
+        Filters of all given columns must match.
+        """
+        where_name = f"{self.model_to_type_or_interface_name(model)}Where"
+        if where_name not in self.filter_types:
+            fields = []
+            for key, column in inspect(model).columns.items():
+                filter_type = self._filter_type_for(column)
+                if filter_type is not None:
+                    fields.append(
+                        (key, Optional[filter_type], dataclasses.field(default=None))
+                    )
+            self.filter_types[where_name] = strawberry.input(
+                dataclasses.make_dataclass(where_name, fields)
+            )
+        return self.filter_types[where_name]
+
+    def _order_by_type_for(self, model: Type[BaseModelType]) -> Type[Any]:
+        """
+        Get or create the <Model>OrderBy input of the given related model,
+        with a direction for each column that can be ordered on
+        (numeric, string, temporal and boolean columns).
+        """
+        order_by_name = f"{self.model_to_type_or_interface_name(model)}OrderBy"
+        if order_by_name not in self.filter_types:
+            fields = []
+            for key, column in inspect(model).columns.items():
+                annotation = self._scalar_type_for(column)
+                if annotation in self._ordered_scalars or annotation is bool:
+                    fields.append(
+                        (
+                            key,
+                            Optional[OrderDirection],
+                            dataclasses.field(default=None),
+                        )
+                    )
+            self.filter_types[order_by_name] = strawberry.input(
+                dataclasses.make_dataclass(order_by_name, fields)
+            )
+        return self.filter_types[order_by_name]
+
     def _get_polymorphic_base_model(
         self, model: Type[BaseModelType]
     ) -> Type[BaseModelType]:
@@ -441,30 +733,34 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
         if is_multiple and not self._is_connection_type(
             cast(Union[Type[Any], ForwardRef], strawberry_type)
         ):
-            if isinstance(strawberry_type, ForwardRef):
-                strawberry_type = self._connection_type_for(
-                    strawberry_type.__forward_arg__
-                )
-            else:
-                strawberry_type = self._connection_type_for(
-                    cast(Type[Any], strawberry_type).__name__
-                )
+            # The type of to-one relationships may be wrapped in Optional
+            strawberry_type = self._connection_type_for(
+                self.model_to_type_or_interface_name(relationship.entity.entity)
+            )
         return strawberry_type
 
     def make_connection_wrapper_resolver(
-        self, resolver: Callable[..., Awaitable[Any]], type_name: str, connection_type
+        self,
+        resolver: Callable[..., Awaitable[Any]],
+        type_name: str,
+        connection_type,
+        where_type: Optional[Type[Any]] = None,
+        order_by_type: Optional[Type[Any]] = None,
     ) -> Callable[..., Awaitable[Any]]:
         """
         Wrap a resolver that returns an array of model types to return
         a Connection instead.
+
+        Edges (and their cursors) are only built if selected.
+        The resolver is called with `(self, info, page_input)`. If a
+        `where_type` (resp. `order_by_type`) is given, the wrapper also takes
+        a `where` (resp. a list of `order_by`) argument of this type, handed
+        to the resolver as a keyword argument.
         """
         # connection_type = self._connection_type_for(type_name)
         edge_type = self._edge_type_for(type_name)
 
-        async def wrapper(
-            self, info: Info, page_input: Optional[RelativePageInput] = None
-        ):
-            objects = await resolver(self, info, page_input)
+        def to_connection(info: Info, objects: PagingList) -> Any:
             return connection_type(
                 edges=[
                     edge_type(
@@ -472,68 +768,272 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
                         cursor=cursor_from_obj(related_object),
                     )
                     for related_object in objects
-                ],
+                ]
+                if selects_field(info, "edges")
+                else [],
                 page_info=objects.page_info,
+                total_count=objects.total_count,
             )
 
+        # Only arguments of generated types are exposed in the schema,
+        # and handed to the resolver
+        wrapper: Callable[..., Awaitable[Any]]
+        if where_type is not None and order_by_type is not None:
+
+            async def wrapper(
+                self,
+                info: Info,
+                page_input: Optional[RelativePageInput] = None,
+                where: Optional[where_type] = None,  # type: ignore
+                order_by: Optional[List[order_by_type]] = None,  # type: ignore
+            ):
+                objects = await resolver(
+                    self, info, page_input, where=where, order_by=order_by
+                )
+                return to_connection(info, objects)
+
+        elif where_type is not None:
+
+            async def wrapper(
+                self,
+                info: Info,
+                page_input: Optional[RelativePageInput] = None,
+                where: Optional[where_type] = None,  # type: ignore
+            ):
+                objects = await resolver(self, info, page_input, where=where)
+                return to_connection(info, objects)
+
+        elif order_by_type is not None:
+
+            async def wrapper(
+                self,
+                info: Info,
+                page_input: Optional[RelativePageInput] = None,
+                order_by: Optional[List[order_by_type]] = None,  # type: ignore
+            ):
+                objects = await resolver(self, info, page_input, order_by=order_by)
+                return to_connection(info, objects)
+
+        else:
+
+            async def wrapper(
+                self, info: Info, page_input: Optional[RelativePageInput] = None
+            ):
+                objects = await resolver(self, info, page_input)
+                return to_connection(info, objects)
+
         setattr(wrapper, _IS_GENERATED_RESOLVER_KEY, True)
 
         return wrapper
 
-    def relationship_resolver_for(
+    def _relationship_loader_for(
         self, relationship: RelationshipProperty
     ) -> Callable[..., Awaitable[Any]]:
         """
-        Return an async field resolver for the given relationship,
-        so as to avoid n+1 query problem.
+        Return an async function loading the objects related to an instance
+        through the given relationship, batching loads with the request loader.
+
+        Objects of pinned models are looked up in memory instead.
+        With `where` criteria, only related objects matching them are returned,
+        sorted by `ordering` if given. Columns of `polymorphic` subclasses
+        are loaded along with the related objects. A `depth` greater than 1
+        loads that many levels of a self-referential relationship at once.
+        Many-to-one relationships of related objects whose keys are `joined`
+        are loaded by the same statement.
         """
-
-        async def resolve(
-            self, info: Info, page_input: Optional[RelativePageInput] = None
+        sqlalchemy_mapper = self
+
+        async def load(
+            self,
+            info: Info,
+            page_input: Optional[RelativePageInput] = None,
+            projection: Optional[FrozenSet[str]] = None,
+            total_count: bool = False,
+            count_only: bool = False,
+            where: Criteria = (),
+            ordering: Ordering = (),
+            polymorphic: FrozenSet[type] = frozenset(),
+            depth: int = 1,
+            joined: FrozenSet[str] = frozenset(),
         ):
             instance_state = cast(InstanceState, inspect(self))
             if relationship.key not in instance_state.unloaded:
                 objects = getattr(self, relationship.key)
-                if relationship.uselist:
-                    related_objects = PagingList([obj for obj in objects])
-
-                    if page_input is not None:
-                        related_objects = related_objects.page(page_input)
-
-                    elif related_objects:
-                        related_objects.set_page_info(
-                            PageInfo(
-                                False,
-                                False,
-                                cursor_from_obj(objects[0]),
-                                cursor_from_obj(objects[-1]),
-                            )
-                        )
-                else:
-                    related_objects = objects
-                    # related_objects[0].page_info = page_info
-
             else:
-                relationship_key = tuple(
-                    [
-                        getattr(self, local.key)
-                        for local, _ in relationship.local_remote_pairs
-                    ]
-                )
+                relationship_key = loader_relationship_key(relationship, self)
                 if any(item is None for item in relationship_key):
                     if relationship.uselist:
                         return []
                     else:
                         return None
-                if isinstance(info.context, dict):
-                    loader = info.context["sqlalchemy_loader"]
+                pinned_table = sqlalchemy_mapper.pinned_tables.get(
+                    relationship.mapper.class_
+                )
+                if pinned_table is not None and PinnedTable.supports(relationship):
+                    objects = pinned_table.related(relationship, relationship_key)
                 else:
-                    loader = info.context.sqlalchemy_loader
-                related_objects = await loader.loader_for(relationship).load(
-                    (page_input, relationship_key)
+                    loader = _loader_from_context(info)
+                    if depth > 1:
+                        return await loader.tree_loader_for(relationship, depth).load(
+                            relationship_key
+                        )
+                    if count_only:
+                        related_loader = loader.count_loader_for(relationship, where)
+                    else:
+                        related_loader = loader.loader_for(
+                            relationship,
+                            projection,
+                            total_count,
+                            where,
+                            ordering,
+                            polymorphic,
+                            joined,
+                        )
+                    return await related_loader.load((page_input, relationship_key))
+
+            if relationship.uselist:
+                if where:
+                    objects = [obj for obj in objects if matches(obj, where)]
+                if ordering:
+                    objects = sort(objects, ordering)
+                related_objects = PagingList(
+                    [obj for obj in objects], total_count=len(objects)
                 )
+
+                if page_input is not None:
+                    related_objects = related_objects.page(page_input)
+
+                elif related_objects:
+                    related_objects.set_page_info(
+                        PageInfo(
+                            False,
+                            False,
+                            cursor_from_obj(objects[0]),
+                            cursor_from_obj(objects[-1]),
+                        )
+                    )
+            else:
+                related_objects = objects
+                # related_objects[0].page_info = page_info
             return related_objects
 
+        return load
+
+    def _polymorphic_classes_for(
+        self, mapper: Mapper, selections: List[Selection]
+    ) -> FrozenSet[type]:
+        """
+        Subclasses of a polymorphic model that fragments of the given
+        selections are selected on
+        """
+        type_names = fragment_type_names(selections)
+        return frozenset(
+            submapper.class_
+            for submapper in mapper.self_and_descendants
+            if submapper is not mapper
+            and self.model_to_type_or_interface_name(submapper.class_) in type_names
+        )
+
+    def _relationship_resolve_for(
+        self, relationship: RelationshipProperty, connection: bool
+    ) -> Callable[..., Awaitable[Any]]:
+        """
+        Return an async function resolving the given relationship for
+        a field returning its objects, or a Connection if `connection` is set.
+
+        Only the columns needed by the selection made on the field are loaded.
+        Subclasses of a polymorphic related model that fragments are selected
+        on have their columns loaded by the same statements.
+
+        When a self-referential relationship is selected again in the objects
+        it returns, every nested level is loaded by a single recursive query.
+        Many-to-one relationships selected on related objects are joined
+        to the statement loading them, saving a round trip per level.
+
+        Connections of uselist relationships also take a generated
+        <Model>Where input and a list of <Model>OrderBy inputs, applied by
+        the loader in its batched statements. Their total count is only
+        computed if selected, and when neither edges nor cursors
+        are selected, related objects are only counted.
+        """
+        sqlalchemy_mapper = self
+        load = self._relationship_loader_for(relationship)
+        connection = connection and relationship.uselist
+
+        async def resolve(
+            self,
+            info: Info,
+            page_input: Optional[RelativePageInput] = None,
+            where: Optional[Any] = None,
+            order_by: Optional[List[Any]] = None,
+        ):
+            selections = node_selections(info, connection)
+            projection = projection_for(relationship.mapper, selections)
+            polymorphic: FrozenSet[type] = frozenset()
+            if projection is None:
+                polymorphic = sqlalchemy_mapper._polymorphic_classes_for(
+                    relationship.mapper, selections
+                )
+            total_count = connection and selects_field(info, "total_count")
+            count_only = (
+                connection
+                and not selects_field(info, "edges")
+                and not _CURSOR_FIELDS.intersection(subfield_names(info, "page_info"))
+                and (page_input is None or page_input.keyset is None)
+            )
+            criteria = criteria_from_where(where)
+            ordering = ordering_from_order_by(order_by)
+            depth = 1
+            if (
+                is_self_referential(relationship)
+                and page_input is None
+                and not count_only
+                and not criteria
+                and not ordering
+                and not polymorphic
+            ):
+                depth = nesting_depth(info, relationship.key, connection)
+            # Pinned models are looked up in memory
+            joined = frozenset(
+                key
+                for key in to_one_relationship_keys(relationship.mapper, selections)
+                if relationship.mapper.relationships[key].mapper.class_
+                not in sqlalchemy_mapper.pinned_tables
+            )
+            return await load(
+                self,
+                info,
+                page_input,
+                projection,
+                total_count,
+                count_only,
+                criteria,
+                ordering,
+                polymorphic,
+                depth,
+                joined,
+            )
+
+        return resolve
+
+    def relationship_resolver_for(
+        self, relationship: RelationshipProperty
+    ) -> Callable[..., Awaitable[Any]]:
+        """
+        Return an async field resolver for the given relationship,
+        so as to avoid n+1 query problem.
+
+        Only the columns needed by the selection made on the field are loaded.
+        """
+        resolve_relationship = self._relationship_resolve_for(
+            relationship, connection=False
+        )
+
+        async def resolve(
+            self, info: Info, page_input: Optional[RelativePageInput] = None
+        ):
+            return await resolve_relationship(self, info, page_input)
+
         setattr(resolve, _IS_GENERATED_RESOLVER_KEY, True)
 
         if not relationship.uselist:
@@ -546,26 +1046,102 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
 
         return resolve
 
+    def aggregate_resolver_for(
+        self, relationship: RelationshipProperty
+    ) -> Callable[..., Awaitable[Any]]:
+        """
+        Return an async field resolver computing the <Model>Aggregate of
+        the objects related through the given (uselist) relationship.
+
+        Only selected aggregates are computed, with a single `GROUP BY`
+        statement per batch of parents (or in python, if the relationship
+        is already loaded).
+        """
+        related_model = relationship.entity.entity
+        aggregate_type = self._aggregate_type_for(related_model)
+        aggregate_name = aggregate_type.__name__
+        function_types = {
+            function: self.aggregate_types[f"{aggregate_name}{suffix}"]
+            for function, suffix in [
+                ("sum", "Sum"),
+                ("avg", "Avg"),
+                ("min", "MinMax"),
+                ("max", "MinMax"),
+            ]
+            if f"{aggregate_name}{suffix}" in self.aggregate_types
+        }
+        column_keys = {}
+        for key in inspect(related_model).columns.keys():
+            column_keys[key] = column_keys[to_camel_case(key)] = key
+
+        async def resolve(self, info: Info):
+            selections = [
+                s for f in iter_fields(info.selected_fields) for s in f.selections
+            ]
+            aggregates = frozenset(
+                (function, column_keys[subfield.name])
+                for function in function_types
+                for field in find_fields(selections, function)
+                for subfield in iter_fields(field.selections)
+                if subfield.name in column_keys
+            )
+            instance_state = cast(InstanceState, inspect(self))
+            if relationship.key not in instance_state.unloaded:
+                values = _aggregate_objects(getattr(self, relationship.key), aggregates)
+            else:
+                relationship_key = loader_relationship_key(relationship, self)
+                if any(item is None for item in relationship_key):
+                    values = _aggregate_objects([], aggregates)
+                else:
+                    loader = _loader_from_context(info)
+                    values = await loader.aggregate_loader_for(
+                        relationship, aggregates
+                    ).load(relationship_key)
+
+            return aggregate_type(
+                count=values["count"],
+                **{
+                    function: function_type(
+                        **{
+                            key: values[(function, key)]
+                            for other, key in aggregates
+                            if other == function
+                        }
+                    )
+                    for function, function_type in function_types.items()
+                },
+            )
+
+        setattr(resolve, _IS_GENERATED_RESOLVER_KEY, True)
+        return resolve
+
     def connection_resolver_for(
         self, relationship: RelationshipProperty
     ) -> Callable[..., Awaitable[Any]]:
         """
         Return an async field resolver for the given relationship that
-        returns a Connection instead of an array of objects.
+        returns a Connection instead of an array of objects
+        (filtered by a `where` argument, if filters are generated,
+        and sorted by an `order_by` argument, if order bys are generated).
         """
         type_name = self.model_to_type_or_interface_name(relationship.entity.entity)
         connection_type = self._connection_type_for(type_name)
-        relationship_resolver = self.relationship_resolver_for(relationship)
 
         if relationship.uselist:
             return self.make_connection_wrapper_resolver(
-                relationship_resolver,
+                self._relationship_resolve_for(relationship, connection=True),
                 type_name,
-                connection_type
+                connection_type,
                 # self.model_to_type_or_interface_name(relationship.entity.entity),
+                self._where_type_for(relationship.entity.entity)
+                if self.generate_filters
+                else None,
+                self._order_by_type_for(relationship.entity.entity)
+                if self.generate_order_by
+                else None,
             )
         else:
-            return relationship_resolver
+            return self.relationship_resolver_for(relationship)
 
     def _is_connection_type(self, type_: Union[Type[Any], ForwardRef]) -> bool:
         """
@@ -573,64 +1149,138 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
         """
         return getattr(type_, _IS_GENERATED_CONNECTION_TYPE_KEY, False)
 
+    def column_resolver_for(
+        self, column_property: ColumnProperty
+    ) -> Callable[..., Awaitable[Any]]:
+        """
+        Return an async field resolver for the given (deferred) column.
+
+        Unloaded values are read with the values of the same column of other
+        objects resolved during the same tick, instead of being lazy loaded
+        one object at a time (which async sessions don't support).
+        """
+        key = column_property.key
+        mapper: Mapper = column_property.parent
+
+        async def resolve(self, info: Info):
+            instance_state = cast(InstanceState, inspect(self))
+            if key not in instance_state.unloaded or instance_state.key is None:
+                return getattr(self, key)
+            loader = _loader_from_context(info)
+            value = await loader.column_loader_for(mapper, key).load(
+                instance_state.identity
+            )
+            set_committed_value(self, key, value)
+            return value
+
+        setattr(resolve, _IS_GENERATED_RESOLVER_KEY, True)
+        return resolve
+
     def association_proxy_resolver_for(
         self, mapper: Mapper, descriptor: Any, strawberry_type: Type
     ) -> Callable[..., Awaitable[Any]]:
         """
         Return an async field resolver for the given association proxy.
+
+        Unless the in-between relationship is already loaded (or its model
+        pinned), both relationships are joined by a single statement per
+        batch of parents, intermediate objects are never loaded, and pages
+        of connections are computed in SQL.
         """
+        sqlalchemy_mapper = self
         in_between_relationship = mapper.relationships[descriptor.target_collection]
-        in_between_resolver = self.relationship_resolver_for(in_between_relationship)
+        in_between_resolver = self._relationship_loader_for(in_between_relationship)
         in_between_mapper: Mapper = mapper.relationships[
             descriptor.target_collection
         ].entity
         assert descriptor.value_attr in in_between_mapper.relationships
         end_relationship = in_between_mapper.relationships[descriptor.value_attr]
-        end_relationship_resolver = self.relationship_resolver_for(end_relationship)
+        end_relationship_resolver = self._relationship_loader_for(end_relationship)
         end_type_name = self.model_to_type_or_interface_name(
             end_relationship.entity.entity
         )
         connection_type = self._connection_type_for(end_type_name)
-        edge_type = self._edge_type_for(end_type_name)
         is_multiple = self._is_connection_type(strawberry_type)
 
-        async def resolve(self, info: Info):
+        async def load_joined(
+            self, info: Info, page_input: Optional[RelativePageInput]
+        ) -> Tuple[bool, Any]:
+            """
+            Load the proxied objects with the proxy loader, returning
+            `(False, None)` when it can't be used
+            """
+            instance_state = cast(InstanceState, inspect(self))
+            if (
+                in_between_relationship.key not in instance_state.unloaded
+                or in_between_relationship.mapper.class_
+                in sqlalchemy_mapper.pinned_tables
+                or (page_input is not None and page_input.keyset is not None)
+            ):
+                return False, None
+            relationship_key = loader_relationship_key(in_between_relationship, self)
+            if any(item is None for item in relationship_key):
+                return True, PagingList(total_count=0) if is_multiple else None
+            loader = _loader_from_context(info)
+            proxy_loader = loader.proxy_loader_for(
+                in_between_relationship,
+                end_relationship,
+                is_multiple and selects_field(info, "total_count"),
+            )
+            return True, await proxy_loader.load((page_input, relationship_key))
+
+        async def load_objects(self, info: Info) -> Any:
             in_between_objects = await in_between_resolver(self, info)
             if in_between_objects is None:
-                if is_multiple:
-                    return connection_type(edges=[])
-                else:
-                    return None
-            if descriptor.value_attr in in_between_mapper.relationships:
-                assert end_relationship_resolver is not None
-                if isinstance(in_between_objects, collections.abc.Iterable):
-                    outputs = await asyncio.gather(
-                        *[
-                            end_relationship_resolver(obj, info)
-                            for obj in in_between_objects
-                        ]
-                    )
-                    if outputs and isinstance(outputs[0], list):
-                        outputs = list(chain.from_iterable(outputs))
-                    else:
-                        outputs = [output for output in outputs if output is not None]
-                else:
-                    outputs = await end_relationship_resolver(in_between_objects, info)
-                if not isinstance(outputs, collections.abc.Iterable):
-                    return outputs
-                return connection_type(edges=[edge_type(node=obj) for obj in outputs])
-            else:
-                assert descriptor.value_attr in in_between_mapper.columns
-                if isinstance(in_between_objects, collections.abc.Iterable):
-                    return [
-                        getattr(obj, descriptor.value_attr)
+                return [] if is_multiple else None
+            if isinstance(in_between_objects, collections.abc.Iterable):
+                outputs = await asyncio.gather(
+                    *[
+                        end_relationship_resolver(obj, info)
                         for obj in in_between_objects
                     ]
-                else:
-                    return getattr(in_between_objects, descriptor.value_attr)
+                )
+                if outputs and isinstance(outputs[0], list):
+                    return list(chain.from_iterable(outputs))
+                return [output for output in outputs if output is not None]
+            return await end_relationship_resolver(in_between_objects, info)
 
-        setattr(resolve, _IS_GENERATED_RESOLVER_KEY, True)
-        return resolve
+        if not is_multiple:
+
+            async def resolve(self, info: Info):
+                loaded, value = await load_joined(self, info, None)
+                if loaded:
+                    return value
+                return await load_objects(self, info)
+
+            setattr(resolve, _IS_GENERATED_RESOLVER_KEY, True)
+            return resolve
+
+        async def resolve_list(
+            self, info: Info, page_input: Optional[RelativePageInput] = None
+        ):
+            loaded, value = await load_joined(self, info, page_input)
+            if loaded:
+                return value
+            objects = await load_objects(self, info)
+            if not isinstance(objects, list):
+                objects = [objects] if objects is not None else []
+            related_objects = PagingList(objects, total_count=len(objects))
+            if page_input is not None:
+                return related_objects.page(page_input)
+            if related_objects:
+                related_objects.set_page_info(
+                    PageInfo(
+                        False,
+                        False,
+                        cursor_from_obj(objects[0]),
+                        cursor_from_obj(objects[-1]),
+                    )
+                )
+            return related_objects
+
+        return self.make_connection_wrapper_resolver(
+            resolve_list, end_type_name, connection_type
+        )
 
     def _is_optional(self, type_: Any) -> bool:
         return getattr(type_, "_name", None) == "Optional"
@@ -720,6 +1370,19 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
 
             self._handle_columns(mapper, type_, excluded_keys, generated_field_keys, old_annotations)
 
+            for key, column_property in mapper.column_attrs.items():
+                if (
+                    not column_property.deferred
+                    or key not in generated_field_keys
+                    or hasattr(type_, key)
+                ):
+                    continue
+                field = strawberry.field(
+                    resolver=self.column_resolver_for(column_property)
+                )
+                assert not field.init
+                setattr(type_, key, field)
+
             for key, relationship in mapper.relationships.items():
                 relationship: RelationshipProperty  # type: ignore
                 if (
@@ -747,6 +1410,25 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
                     key,
                     field,
                 )
+                aggregate_key = f"{key}_aggregate"
+                if (
+                    self.generate_aggregates
+                    and relationship.uselist
+                    and aggregate_key not in excluded_keys
+                    and aggregate_key not in type_.__annotations__
+                    and not hasattr(type_, aggregate_key)
+                ):
+                    self._add_annotation(
+                        type_,
+                        aggregate_key,
+                        self._aggregate_type_for(relationship.entity.entity),
+                        generated_field_keys,
+                    )
+                    field = strawberry.field(
+                        resolver=self.aggregate_resolver_for(relationship)
+                    )
+                    assert not field.init
+                    setattr(type_, aggregate_key, field)
             for key, descriptor in mapper.all_orm_descriptors.items():
                 if (
                     key in excluded_keys
@@ -949,6 +1631,38 @@ class StrawberrySQLAlchemyMapper(Generic[BaseModelType]):
         self._map_unmapped_relationships()
         self._fix_annotation_namespaces()
 
+    async def refresh_pinned(
+        self,
+        bind: Union[AsyncEngine, Callable[[], AsyncSession]],
+        models: Optional[Iterable[Type[BaseModelType]]] = None,
+    ) -> None:
+        """
+        (Re)load the rows of pinned models in memory, typically on startup.
+
+        Rows are loaded in a dedicated session, from an AsyncEngine or a
+        sessionmaker, and replace the previous ones at once: resolvers never
+        see a partially refreshed state. Until pinned models are loaded,
+        their relationships are resolved from the database.
+
+        Args:
+            bind: AsyncEngine or sessionmaker used to load rows
+            models: Pinned models to refresh, by default all of them
+        """
+        models = self.pinned_models if models is None else set(models)
+        if isinstance(bind, AsyncEngine):
+            session = AsyncSession(bind)
+        else:
+            session = bind()
+        pinned_tables = dict(self.pinned_tables)
+        async with session:
+            for model in models:
+                mapper: Mapper = inspect(model)
+                result = await session.execute(
+                    select(model).options(undefer("*")).order_by(*mapper.primary_key)
+                )
+                pinned_tables[model] = PinnedTable(mapper, result.scalars().all())
+        self.pinned_tables = pinned_tables
+
     def _fix_annotation_namespaces(self) -> None:
         """
         Modify the namespaces of the fields of the generated types by this
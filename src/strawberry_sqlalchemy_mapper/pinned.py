@@ -0,0 +1,68 @@
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+from sqlalchemy.orm import Mapper, RelationshipProperty
+
+from strawberry_sqlalchemy_mapper.loader import has_custom_join, relationship_key_pairs
+
+
+class PinnedTable:
+    """
+    Read-only rows of a pinned model, kept in memory and indexed
+    by the attributes relationships are joined on.
+
+    Rows are detached instances with every column loaded, shared by all
+    requests: they must not be modified.
+    """
+
+    def __init__(self, mapper: Mapper, objects: Sequence[Any]) -> None:
+        self.mapper = mapper
+        self.objects: Tuple[Any, ...] = tuple(objects)
+        self._indexes: Dict[Tuple[str, ...], Mapping[Tuple, Tuple[Any, ...]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def index(self, keys: Tuple[str, ...]) -> Mapping[Tuple, Tuple[Any, ...]]:
+        """
+        Rows grouped by their values of the given attribute keys,
+        in primary key order
+        """
+        try:
+            return self._indexes[keys]
+        except KeyError:
+            index: Dict[Tuple, List[Any]] = {}
+            for obj in self.objects:
+                index.setdefault(tuple(getattr(obj, key) for key in keys), []).append(
+                    obj
+                )
+            self._indexes[keys] = {
+                values: tuple(objects) for values, objects in index.items()
+            }
+            return self._indexes[keys]
+
+    @staticmethod
+    def supports(relationship: RelationshipProperty) -> bool:
+        """
+        Whether objects related through `relationship` can be looked up
+        in memory: the relationship must be a plain equality join
+        on columns, without ordering.
+        """
+        return (
+            relationship.secondary is None
+            and not relationship.order_by
+            and not has_custom_join(relationship)
+        )
+
+    def related(self, relationship: RelationshipProperty, key: Tuple) -> Any:
+        """
+        Objects related through `relationship` to a parent with the given
+        relationship key: a list, or an object or None for to-one relationships
+        """
+        keys = tuple(
+            self.mapper.get_property_by_column(remote).key
+            for _, remote in relationship_key_pairs(relationship)
+        )
+        objects = self.index(keys).get(key, ())
+        if relationship.uselist:
+            return list(objects)
+        return objects[0] if objects else None
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 from typing import TYPE_CHECKING, Any, List, Optional, Tuple, Union
 
 import strawberry
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import Select
 from strawberry.types import Info
@@ -68,6 +70,8 @@ class Connection:
 
     edges: List[Edge]
     page_info: PageInfo
+    #: Number of nodes in all pages, only computed when selected
+    total_count: Optional[int] = None
 
 
 @strawberry.input
@@ -122,9 +126,17 @@ class PageInput:
 
 
 class PagingList(list):
-    def __init__(self, *args, page_info: PageInfo = None, **kwargs):
+    def __init__(
+        self,
+        *args,
+        page_info: PageInfo = None,
+        total_count: Optional[int] = None,
+        **kwargs,
+    ):
         super().__init__(*args, **kwargs)
         self._page_info = page_info
+        #: Number of objects in all pages, if known
+        self.total_count = total_count
 
     @property
     def page_info(self) -> PageInfo:
@@ -138,10 +150,13 @@ class PagingList(list):
     def page(self, page_input: RelativePageInput) -> "PagingList":
         """Paginate from a list of PagedObjects."""
 
+        if page_input.keyset is not None:
+            return self._keyset_page(page_input)
+
         place = page_input.place
         backward = page_input.last is not None
 
-        if place is not None:
+        if place:
             start = -1 if backward else 0
 
             for i, _ in enumerate(self):
@@ -178,18 +193,73 @@ class PagingList(list):
                     ),
                 )
             )
-        return PagingList(self[start:stop], page_info=self._page_info)
+        return PagingList(
+            self[start:stop], page_info=self._page_info, total_count=len(self)
+        )
+
+    def _keyset_page(self, page_input: RelativePageInput) -> "PagingList":
+        """Paginate after (or before) the object of a keyset cursor."""
+
+        ids = [obj.id for obj in self]
+        if page_input.keyset[0] not in ids:
+            return PagingList(total_count=len(self))
+        position = ids.index(page_input.keyset[0])
+
+        if page_input.last is not None:
+            candidates = self[:position]
+            objects = candidates[max(len(candidates) - page_input.last, 0) :]
+            has_next_page, has_previous_page = True, len(candidates) > len(objects)
+        else:
+            candidates = self[position + 1 :]
+            objects = candidates[: page_input.first]
+            has_next_page, has_previous_page = len(candidates) > len(objects), True
+
+        page = PagingList(objects, total_count=len(self))
+        if objects:
+            page.set_page_info(
+                PageInfo(
+                    has_next_page=has_next_page,
+                    has_previous_page=has_previous_page,
+                    start_cursor=cursor_from_obj(objects[0]),
+                    end_cursor=cursor_from_obj(objects[-1]),
+                )
+            )
+        return page
 
 
 @strawberry.input
 class RelativePageInput:
+    """
+    Page of a nested connection.
+
+    Pages either start at a position (`after`/`before` index), or after
+    (before) the edge of a keyset cursor (`afterCursor`/`beforeCursor`,
+    the cursor of an edge), which takes precedence: `afterCursor` goes with
+    `first`, and `beforeCursor` with `last`. Keyset pages stay valid when
+    rows are inserted, and deep pages are as cheap as the first.
+    """
 
     after: Optional[int] = 0
     first: Optional[int] = None
     last: Optional[int] = None
     before: Optional[int] = None
+    after_cursor: Optional[str] = None
+    before_cursor: Optional[str] = None
 
     _error = "Valid combinations are either first/afterIndex or last/beforeIndex."
+    _cursor_error = (
+        "Valid combinations are either first/afterCursor or last/beforeCursor."
+    )
+
+    def __post_init__(self) -> None:
+        if self.first is not None and self.before_cursor is not None:
+            raise ValueError(
+                f"You can't use 'beforeCursor' with 'first'. {self._cursor_error}"
+            )
+        if self.last is not None and self.after_cursor is not None:
+            raise ValueError(
+                f"You can't use 'afterCursor' with 'last'. {self._cursor_error}"
+            )
 
     @property
     def place(self) -> Optional[int]:
@@ -225,12 +295,23 @@ class RelativePageInput:
         place = self.place
         return (self.place,) if place else None
 
+    @property
+    def keyset(self) -> Optional[Tuple[int]]:
+        """
+        Primary key of the edge the page starts after (or ends before),
+        if a keyset cursor is given
+        """
+        cursor = self.before_cursor if self.last is not None else self.after_cursor
+        return (decode_cursor(cursor),) if cursor else None
+
     def __hash__(self) -> int:
         keys = [
             self.after or "",
             self.first or "",
             self.before or "",
             self.last or "",
+            self.after_cursor or "",
+            self.before_cursor or "",
         ]
         return hash("".join(str(k) for k in keys))
 
@@ -264,6 +345,15 @@ async def page(selectable: Select, page_input: PageInput, session: AsyncSession)
     return [item[0] for item in page], page_info
 
 
+def count_statement(selectable: Select) -> Select:
+    """Count the rows of a query, regardless of its ordering."""
+    return select(func.count()).select_from(selectable.order_by(None).subquery())
+
+
+async def count(selectable: Select, session: AsyncSession) -> int:
+    return (await session.execute(count_statement(selectable))).scalar_one()
+
+
 async def connection(
     selectable: Select, page_input: PageInput, connection: type[Connection], info: Info
 ) -> Tuple[List[Any], PageInfo]:
@@ -273,7 +363,12 @@ async def connection(
     >>> def users(page_input: PageInput) -> UserConnection:
     >>>     query = select(User).order_by(User.id)
     >>>     return await connection(query, page_input, UserConnection)
+
+    `total_count` is only counted if selected, concurrently with the page
+    when the context loader can run statements concurrently.
     """
+    # Imported here to avoid a circular import
+    from strawberry_sqlalchemy_mapper.selection import selects_field
 
     for f in connection._type_definition.fields:
         if f.name == "edges":
@@ -282,12 +377,23 @@ async def connection(
     else:
         raise TypeError(f"{connection} type has no edges field")
 
-    objects, page_info = await page(
-        selectable, page_input, session=info.context["session"]
-    )
+    session = info.context["session"]
+    total_count = None
+    if not selects_field(info, "total_count"):
+        objects, page_info = await page(selectable, page_input, session=session)
+    else:
+        loader = info.context.get("sqlalchemy_loader")
+        if loader is not None and loader.concurrent:
+            (objects, page_info), total_count = await asyncio.gather(
+                page(selectable, page_input, session=session),
+                loader.count(selectable),
+            )
+        else:
+            objects, page_info = await page(selectable, page_input, session=session)
+            total_count = await count(selectable, session)
 
     edges = [edge(node=item, cursor=cursor_from_obj(item)) for item in objects]
-    return connection(edges=edges, page_info=page_info)
+    return connection(edges=edges, page_info=page_info, total_count=total_count)
 
 
 class ConnectionMixin:
@@ -0,0 +1,159 @@
+from typing import FrozenSet, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy.orm import MANYTOONE, Mapper, RelationshipProperty
+from strawberry.types import Info
+from strawberry.types.nodes import SelectedField, Selection
+from strawberry.utils.str_converters import to_camel_case
+
+from strawberry_sqlalchemy_mapper.loader import relationship_local_columns
+
+
+def iter_fields(selections: Iterable[Selection]) -> Iterator[SelectedField]:
+    """
+    Yield selected fields, flattening fragment spreads and inline fragments
+    """
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            yield selection
+        else:
+            yield from iter_fields(selection.selections)
+
+
+def fragment_type_names(selections: Iterable[Selection]) -> Set[str]:
+    """
+    Names of the types fragment spreads and inline fragments are selected on,
+    not descending into selected fields
+    """
+    names: Set[str] = set()
+    for selection in selections:
+        if not isinstance(selection, SelectedField):
+            names.add(selection.type_condition)
+            names.update(fragment_type_names(selection.selections))
+    return names
+
+
+def find_fields(selections: Iterable[Selection], name: str) -> List[SelectedField]:
+    """
+    Return all selected fields matching the given name,
+    either in its python or camel cased form
+    """
+    names = {name, to_camel_case(name)}
+    return [field for field in iter_fields(selections) if field.name in names]
+
+
+def selects_field(info: Info, name: str) -> bool:
+    """
+    Whether a field with the given name is selected on the current field
+    """
+    selections = [s for f in iter_fields(info.selected_fields) for s in f.selections]
+    return bool(find_fields(selections, name))
+
+
+def subfield_names(info: Info, name: str) -> Set[str]:
+    """
+    Names of the fields selected under the field `name` of the current field
+    """
+    selections = [s for f in iter_fields(info.selected_fields) for s in f.selections]
+    return {
+        subfield.name
+        for field in find_fields(selections, name)
+        for subfield in iter_fields(field.selections)
+    }
+
+
+def node_selections(info: Info, uselist: bool) -> List[Selection]:
+    """
+    Return the selections made on the objects returned by the current field.
+
+    For connections (`uselist` relationships), these are the selections
+    made under `edges { node { ... } }`.
+    """
+    selections: List[Selection] = list(info.selected_fields)
+    selections = [s for f in iter_fields(selections) for s in f.selections]
+    if uselist:
+        selections = _connection_node_selections(selections)
+    return selections
+
+
+def _connection_node_selections(selections: List[Selection]) -> List[Selection]:
+    selections = [s for f in find_fields(selections, "edges") for s in f.selections]
+    return [s for f in find_fields(selections, "node") for s in f.selections]
+
+
+def nesting_depth(info: Info, name: str, uselist: bool) -> int:
+    """
+    Return the number of levels the current field `name` is selected on,
+    nested in the objects it returns: 1 when it is not nested.
+
+    Nested fields given arguments are not counted, as they are not resolved
+    like the current one.
+    """
+    depth = 1
+    selections = node_selections(info, uselist)
+    while True:
+        fields = find_fields(selections, name)
+        if not fields or any(field.arguments for field in fields):
+            return depth
+        depth += 1
+        selections = [s for f in fields for s in f.selections]
+        if uselist:
+            selections = _connection_node_selections(selections)
+
+
+def relationship_local_keys(relationship: RelationshipProperty) -> List[str]:
+    """
+    Attribute keys of the parent columns a relationship is joined on
+    """
+    parent: Mapper = relationship.parent
+    return [
+        parent.get_property_by_column(local).key
+        for local in relationship_local_columns(relationship)
+    ]
+
+
+def projection_for(
+    mapper: Mapper, selections: Iterable[Selection]
+) -> Optional[FrozenSet[str]]:
+    """
+    Return the column attribute keys of `mapper` needed to resolve
+    the given selections.
+
+    Relationships only need their local columns; anything that is neither
+    a column nor a relationship (hybrid properties, custom resolvers...) may
+    depend on any column, in which case `None` is returned, meaning every
+    column must be loaded.
+    """
+    names = {}
+    for key in mapper.column_attrs.keys():
+        names[key] = names[to_camel_case(key)] = key
+    relationships = {}
+    for key, relationship in mapper.relationships.items():
+        relationships[key] = relationships[to_camel_case(key)] = relationship
+
+    projection: Set[str] = set()
+    for field in iter_fields(selections):
+        if field.name == "__typename":
+            continue
+        elif field.name in names:
+            projection.add(names[field.name])
+        elif field.name in relationships:
+            projection.update(relationship_local_keys(relationships[field.name]))
+        else:
+            return None
+    return frozenset(projection)
+
+
+def to_one_relationship_keys(
+    mapper: Mapper, selections: Iterable[Selection]
+) -> FrozenSet[str]:
+    """
+    Return the keys of the many-to-one relationships of `mapper`
+    selected in the given selections
+    """
+    keys = {}
+    for key, relationship in mapper.relationships.items():
+        if relationship.direction == MANYTOONE and not relationship.uselist:
+            keys[key] = keys[to_camel_case(key)] = key
+    return frozenset(
+        keys[field.name] for field in iter_fields(selections) if field.name in keys
+    )
@@ -9,16 +9,31 @@
 import asyncio
 import datetime
 from contextlib import asynccontextmanager
-from typing import AsyncContextManager, AsyncGenerator, Callable
+from typing import Any, AsyncContextManager, AsyncGenerator, Callable, List
 
 import pytest
 import pytest_asyncio
 from models import Model
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 
 TxManager = Callable[[], AsyncContextManager[AsyncSession]]
 
 
+class Statements(List[str]):
+    """
+    SQL statements executed by the engine, along with their `parameters`
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.parameters: List[Any] = []
+
+    def clear(self) -> None:
+        super().clear()
+        self.parameters.clear()
+
+
 def tx_context_manager(engine: AsyncEngine) -> TxManager:
     @asynccontextmanager
     async def context_manager() -> AsyncGenerator[AsyncSession, None]:
@@ -89,3 +104,20 @@ async def session(engine: AsyncEngine, tables):
 @pytest_asyncio.fixture(scope="session")
 async def transaction(engine: AsyncEngine, tables):
     return tx_context_manager(engine)
+
+
+@pytest.fixture
+def statement_counter(engine: AsyncEngine):
+    """
+    Record the statements executed by the engine during the test.
+    Statements of the test setup should be cleared before counting.
+    """
+    statements = Statements()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append(statement)
+        statements.parameters.append(parameters)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
@@ -1,8 +1,36 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+import asyncio
+import warnings
+
+import pytest
+
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Integer,
+    String,
+    Table,
+    Text,
+    inspect,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, sessionmaker
 
-from strawberry_sqlalchemy_mapper import StrawberrySQLAlchemyLoader
+from conftest import Model
+from strawberry_sqlalchemy_mapper import (
+    InMemoryCacheBackend,
+    LoaderCache,
+    StatementCoalescer,
+    StrawberrySQLAlchemyLoader,
+)
+from strawberry_sqlalchemy_mapper.filters import ordering_clauses, sort
+from strawberry_sqlalchemy_mapper.loader import (
+    PaginationStrategy,
+    _PageWindow,
+    _reverse_order,
+)
+from strawberry_sqlalchemy_mapper.relay import RelativePageInput, cursor_from_obj
 
 
 def test_loader_init():
@@ -34,3 +62,1037 @@ def test_loader_for():
     assert loader.cache_map == {}
     assert loader._loop is None
     assert loader.load_fn is not None
+
+
+class Author(Model):
+    name = Column(String(255))
+    books = relationship("Book", back_populates="author")
+    titled_books = relationship(
+        "Book",
+        primaryjoin="and_(Author.id == Book.author_id, Book.title.isnot(None))",
+        viewonly=True,
+    )
+    namesake_tags = relationship(
+        "Tag",
+        primaryjoin="func.lower(Author.name) == foreign(Tag.name)",
+        viewonly=True,
+    )
+
+
+book_tag = Table(
+    "book_tag",
+    Model.metadata,
+    Column("book_id", ForeignKey("book.id"), primary_key=True),
+    Column("tag_id", ForeignKey("tag.id"), primary_key=True),
+)
+
+
+class Book(Model):
+    title = Column(String(255))
+    summary = Column(Text)
+    author_id = Column(Integer, ForeignKey("author.id"))
+    author = relationship("Author", back_populates="books")
+    tags = relationship("Tag", secondary=book_tag, back_populates="books")
+
+
+class Tag(Model):
+    name = Column(String(255))
+    books = relationship("Book", secondary=book_tag, back_populates="tags")
+
+
+class Firm(Model):
+    staff = relationship("Staff", order_by="Staff.id")
+
+
+class Staff(Model):
+    kind = Column(String(50))
+    firm_id = Column(Integer, ForeignKey("firm.id"))
+    __mapper_args__ = {"polymorphic_on": kind, "polymorphic_identity": "staff"}
+
+
+class Lawyer(Staff):
+    id = Column(Integer, ForeignKey("staff.id"), primary_key=True)
+    bar = Column(String(50))
+    __mapper_args__ = {"polymorphic_identity": "lawyer"}
+
+
+class Engineer(Staff):
+    id = Column(Integer, ForeignKey("staff.id"), primary_key=True)
+    language = Column(String(50))
+    __mapper_args__ = {"polymorphic_identity": "engineer"}
+
+
+class Ticket(Model):
+    created_by_id = Column(Integer, ForeignKey("author.id"))
+    assignee_id = Column(Integer, ForeignKey("author.id"))
+    created_by = relationship("Author", foreign_keys=[created_by_id])
+    assignee = relationship("Author", foreign_keys=[assignee_id])
+
+
+class Category(Model):
+    parent_id = Column(Integer, ForeignKey("category.id"))
+    children = relationship("Category", order_by="Category.id")
+
+
+def test_loader_for_projection():
+    base_loader = StrawberrySQLAlchemyLoader(bind=None)
+    relationship = Author.books.property
+    loader = base_loader.loader_for(relationship, frozenset({"title"}))
+    assert base_loader.loader_for(relationship, frozenset({"title"})) is loader
+    assert base_loader.loader_for(relationship) is not loader
+    assert base_loader.loader_for(relationship, frozenset({"summary"})) is not loader
+
+
+@pytest.mark.parametrize("page_input", [None, RelativePageInput(first=1)])
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_projection(session: AsyncSession, page_input, strategy):
+    session.add_all(
+        [
+            Author(id=1, name="author"),
+            Book(id=1, title="first", summary="summary", author_id=1),
+            Book(id=2, title="second", summary="summary", author_id=1),
+        ]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    books = await loader.loader_for(Author.books.property, frozenset({"title"})).load(
+        (page_input, (1,))
+    )
+
+    assert [book.title for book in books] == ["first", "second"][: len(books)]
+    for book in books:
+        assert "summary" in inspect(book).unloaded
+        assert "author_id" not in inspect(book).unloaded
+
+
+async def test_loader_pagination_strategy(session: AsyncSession):
+    relationship = Author.books.property
+    loader = StrawberrySQLAlchemyLoader(bind=session, union_all_max_keys=2)
+    strategy = loader._pagination_strategy_for(relationship, 2)
+    assert strategy == PaginationStrategy.UNION_ALL
+    strategy = loader._pagination_strategy_for(relationship, 3)
+    assert strategy == PaginationStrategy.WINDOW
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy="lateral")
+    strategy = loader._pagination_strategy_for(relationship, 2)
+    assert strategy == PaginationStrategy.LATERAL
+
+    assert StrawberrySQLAlchemyLoader._supports_lateral(postgresql.dialect())
+
+
+def test_loader_lateral_statement(monkeypatch):
+    loader = StrawberrySQLAlchemyLoader(bind=None, pagination_strategy="lateral")
+    monkeypatch.setattr(loader, "_dialect", lambda mapper: postgresql.dialect())
+    statement = loader._lateral_statement(
+        Author.books.property,
+        [(1,), (2,)],
+        _PageWindow(first=2, after=3, backward=False),
+        ["author_id", "id", "title"],
+    )
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "JOIN LATERAL" in sql
+    assert "LIMIT" in sql and "OFFSET" in sql
+    assert "summary" not in sql
+
+    statement = loader._lateral_statement(
+        Author.books.property,
+        [(1,), (2,)],
+        _PageWindow(first=2, after=3, backward=False),
+        None,
+        total_count=True,
+    )
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "count(*) OVER () AS total_count" in sql
+
+
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_pagination_strategies(session: AsyncSession, strategy):
+    session.add_all([Author(id=1), Author(id=2), Author(id=3)])
+    session.add_all([Book(id=i, author_id=1 + i % 2) for i in range(1, 11)])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    page_input = RelativePageInput(first=2, after=1)
+    pages = await loader.loader_for(Author.books.property).load_many(
+        [(page_input, (1,)), (page_input, (2,)), (page_input, (3,))]
+    )
+
+    assert [[book.id for book in page] for page in pages] == [[4, 6], [3, 5], []]
+    assert pages[0].page_info.has_previous_page
+    assert pages[0].page_info.has_next_page
+    assert not pages[2].page_info.has_next_page
+    assert loader.strategy_stats == {(Author.books.property, strategy): 1}
+
+
+@pytest.mark.parametrize("page_input", [None, RelativePageInput(first=2)])
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_secondary(session: AsyncSession, page_input, strategy):
+    tags = [Tag(id=i, name=f"tag {i}") for i in range(1, 5)]
+    session.add_all(
+        [
+            Book(id=1, tags=tags[:3]),
+            Book(id=2, tags=tags[1:]),
+            Book(id=3),
+        ]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    pages = await loader.loader_for(Book.tags.property, frozenset({"name"})).load_many(
+        [(page_input, (1,)), (page_input, (2,)), (page_input, (3,))]
+    )
+
+    expected = [[1, 2, 3], [2, 3, 4], []]
+    if page_input is not None:
+        expected = [ids[:2] for ids in expected]
+    assert [sorted(tag.id for tag in page) for page in pages] == expected
+    if page_input is not None:
+        assert pages[0].page_info.has_next_page
+        assert not pages[2].page_info.has_next_page
+
+
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_total_count(session: AsyncSession, strategy):
+    session.add_all([Author(id=1), Author(id=2), Author(id=3)])
+    session.add_all([Book(id=i, author_id=1 + i % 2) for i in range(1, 8)])
+    session.add_all([Tag(id=1, books=[Book(id=8), Book(id=9)])])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    pages = await loader.loader_for(Author.books.property, total_count=True).load_many(
+        [
+            (RelativePageInput(first=2), (1,)),
+            (RelativePageInput(first=2), (2,)),
+            (RelativePageInput(first=2), (3,)),
+            # Empty page of a parent with related objects
+            (RelativePageInput(first=2, after=10), (1,)),
+        ]
+    )
+    assert [page.total_count for page in pages] == [3, 4, 0, 3]
+
+    page = await loader.loader_for(Book.tags.property, total_count=True).load(
+        (RelativePageInput(last=1), (8,))
+    )
+    assert page.total_count == 1
+    (page,) = await loader.loader_for(Tag.books.property, total_count=True).load_many(
+        [(RelativePageInput(first=1), (1,))]
+    )
+    assert page.total_count == 2
+
+    # Without pagination, every related object is loaded
+    page = await loader.loader_for(Author.books.property).load((None, (2,)))
+    assert page.total_count == 4
+
+
+@pytest.mark.parametrize(
+    "page_input",
+    [
+        None,
+        RelativePageInput(first=2),
+        RelativePageInput(first=2, after=2),
+        RelativePageInput(first=2, after=4),
+        RelativePageInput(first=2, after=10),
+        RelativePageInput(last=1),
+        RelativePageInput(last=2, before=-2),
+        RelativePageInput(last=2, before=-10),
+    ],
+)
+async def test_loader_count_loader(session: AsyncSession, page_input):
+    session.add_all([Author(id=1), Author(id=2)])
+    session.add_all([Book(id=i, author_id=1) for i in range(1, 5)])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    keys = [(page_input, (1,)), (page_input, (2,))]
+    counted = await loader.count_loader_for(Author.books.property).load_many(keys)
+    loaded = await loader.loader_for(Author.books.property).load_many(keys)
+
+    assert [len(page) for page in counted] == [0, 0]
+    assert [page.total_count for page in counted] == [4, 0]
+    for counted_page, loaded_page in zip(counted, loaded):
+        assert (
+            counted_page.page_info.has_next_page,
+            counted_page.page_info.has_previous_page,
+        ) == (
+            loaded_page.page_info.has_next_page,
+            loaded_page.page_info.has_previous_page,
+        )
+
+
+@pytest.mark.parametrize("page_input", [None, RelativePageInput(first=1)])
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_where(
+    session: AsyncSession, page_input, strategy, statement_counter
+):
+    session.add_all([Author(id=1), Author(id=2)])
+    session.add_all(
+        [
+            Book(id=1, author_id=1, title="a"),
+            Book(id=2, author_id=1, title="b"),
+            Book(id=3, author_id=1),
+            Book(id=4, author_id=2, title="b"),
+        ]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    statement_counter.clear()
+    keys = [(page_input, (1,)), (page_input, (2,))]
+    where = (("title", "in", ("a", "b")), ("title", "ne", "a"))
+    pages = await asyncio.gather(
+        loader.loader_for(Author.books.property, total_count=True).load_many(keys),
+        loader.loader_for(
+            Author.books.property, total_count=True, where=where
+        ).load_many(keys),
+        loader.loader_for(
+            Author.books.property, where=(("title", "is_null", True),)
+        ).load_many(keys),
+    )
+    # One statement per filter, batching every parent
+    assert len(statement_counter) == 3
+    assert [[book.id for book in page] for page in pages[1]] == [[2], [4]]
+    assert [page.total_count for page in pages[0]] == [3, 1]
+    assert [page.total_count for page in pages[1]] == [1, 1]
+    assert [[book.id for book in page] for page in pages[2]] == [[3], []]
+
+    counted = await loader.count_loader_for(Author.books.property, where).load_many(
+        keys
+    )
+    assert [page.total_count for page in counted] == [1, 1]
+
+
+@pytest.mark.parametrize(
+    "page_input",
+    [None, RelativePageInput(first=2), RelativePageInput(last=2)],
+)
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_ordering(session: AsyncSession, page_input, strategy):
+    session.add_all([Author(id=1), Author(id=2)])
+    titles = ["b", "a", None, "a"]
+    session.add_all(
+        [Book(id=i, author_id=1, title=title) for i, title in enumerate(titles, 1)]
+    )
+    session.add_all([Book(id=5, author_id=2, title="c")])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    keys = [(page_input, (1,)), (page_input, (2,))]
+    # Ties are broken by primary key
+    expected = {(("title", False),): [2, 4, 1], (("title", True),): [1, 2, 4]}
+    for ordering, ids in expected.items():
+        pages = await loader.loader_for(
+            Author.books.property,
+            where=(("title", "is_null", False),),
+            ordering=ordering,
+        ).load_many(keys)
+        if page_input is not None:
+            ids = ids[:2] if page_input.first else ids[-2:]
+        assert [[book.id for book in page] for page in pages] == [ids, [5]]
+
+
+@pytest.mark.parametrize(
+    "page_input",
+    [None, RelativePageInput(first=2), RelativePageInput(last=2)],
+)
+async def test_loader_ordering_nulls(session: AsyncSession, page_input):
+    session.add_all([Author(id=1)])
+    titles = ["b", None, "a"]
+    session.add_all(
+        [Book(id=i, author_id=1, title=title) for i, title in enumerate(titles, 1)]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    books = await loader.loader_for(Author.books.property).load((None, (1,)))
+    # NULL values are sorted the same way in SQL and in memory
+    for ordering, ids in [
+        ((("title", False),), [2, 3, 1]),
+        ((("title", True),), [1, 3, 2]),
+    ]:
+        assert [book.id for book in sort(books, ordering)] == ids
+        page = await loader.loader_for(Author.books.property, ordering=ordering).load(
+            (page_input, (1,))
+        )
+        if page_input is not None:
+            ids = ids[:2] if page_input.first else ids[-2:]
+        assert [book.id for book in page] == ids
+
+    # Dialects sorting NULL values last are told otherwise
+    clause = ordering_clauses(Book, (("title", False),), "postgresql")[0]
+    sql = str(clause.compile(dialect=postgresql.dialect()))
+    assert sql == "book.title ASC NULLS FIRST"
+    sql = str(_reverse_order(clause).compile(dialect=postgresql.dialect()))
+    assert sql == "book.title DESC NULLS LAST"
+
+
+def test_loader_order_by_tie_breaker():
+    loader = StrawberrySQLAlchemyLoader(bind=None)
+    # Staff are already ordered by primary key
+    assert len(loader._order_by(Firm.staff.property, None)) == 1
+    assert len(loader._order_by(Category.children.property, None)) == 1
+
+
+@pytest.mark.parametrize("page_input", [None, RelativePageInput(first=2)])
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_polymorphic(
+    session: AsyncSession, page_input, strategy, statement_counter
+):
+    session.add_all([Firm(id=1), Firm(id=2)])
+    session.add_all(
+        [
+            Lawyer(id=1, firm_id=1, bar="ny"),
+            Engineer(id=2, firm_id=1, language="python"),
+            Staff(id=3, firm_id=1),
+            Engineer(id=4, firm_id=2, language="rust"),
+        ]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    statement_counter.clear()
+    polymorphic = frozenset({Lawyer, Engineer})
+    pages = await loader.loader_for(
+        Firm.staff.property, polymorphic=polymorphic
+    ).load_many([(page_input, (1,)), (page_input, (2,))])
+    # Subclass columns are loaded along with every parent's staff
+    assert len(statement_counter) == 1
+    lawyer, engineer = pages[0][:2]
+    assert isinstance(lawyer, Lawyer) and isinstance(engineer, Engineer)
+    assert "bar" in inspect(lawyer).dict
+    assert "language" in inspect(engineer).dict
+    assert [staff.id for staff in pages[1]] == [4]
+    assert "language" in inspect(pages[1][0]).dict
+    assert loader.loader_for(Firm.staff.property) is not loader.loader_for(
+        Firm.staff.property, polymorphic=polymorphic
+    )
+
+
+@pytest.mark.parametrize("page_input", [None, RelativePageInput(first=1)])
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_custom_join(
+    session: AsyncSession, page_input, strategy, statement_counter
+):
+    session.add_all([Author(id=1, name="Ann"), Author(id=2, name="Bob")])
+    session.add_all(
+        [
+            Book(id=1, author_id=1),
+            Book(id=2, author_id=1, title="a"),
+            Book(id=3, author_id=1, title="b"),
+            Book(id=4, author_id=2, title="c"),
+            Book(id=5, author_id=2),
+        ]
+    )
+    session.add_all(
+        [Tag(id=1, name="ann"), Tag(id=2, name="Ann"), Tag(id=3), Tag(id=4, name="zed")]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    statement_counter.clear()
+    # Extra criteria of the join are kept
+    pages = await loader.loader_for(
+        Author.titled_books.property, total_count=True
+    ).load_many([(page_input, (1,)), (page_input, (2,))])
+    assert len(statement_counter) == 1
+    # Parent keys are bound, the author table is not read
+    assert (
+        "FROM author" not in statement_counter[0]
+        and "JOIN author" not in statement_counter[0]
+    )
+    ids = [2, 3] if page_input is None else [2]
+    assert [[book.id for book in page] for page in pages] == [ids, [4]]
+    assert [page.total_count for page in pages] == [2, 1]
+
+    # Parent keys are given to functions of the join
+    # even for parents that aren't stored
+    tags = await loader.loader_for(Author.namesake_tags.property).load_many(
+        [(page_input, ("Ann",)), (page_input, ("Bob",)), (page_input, ("Zed",))]
+    )
+    assert [[tag.id for tag in page] for page in tags] == [[1], [], [4]]
+    counts = await loader.count_loader_for(Author.titled_books.property).load_many(
+        [(None, (1,)), (None, (2,))]
+    )
+    assert [page.total_count for page in counts] == [2, 1]
+
+
+def test_loader_custom_join_lateral_statement(monkeypatch):
+    loader = StrawberrySQLAlchemyLoader(bind=None)
+    monkeypatch.setattr(loader, "_dialect", lambda mapper: postgresql.dialect())
+    statement = loader._lateral_statement(
+        Author.namesake_tags.property,
+        [("Ann",), ("Bob",), ("Ann",)],
+        _PageWindow(first=1, after=0, backward=False),
+        None,
+    )
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "lower(parent_keys.key_0) = tag.name" in sql
+    # Keys are bound as a VALUES list, without reading the author table
+    assert "VALUES" in sql and "author" not in sql
+    params = statement.compile(dialect=postgresql.dialect()).params
+    assert [value for value in params.values() if isinstance(value, str)] == [
+        "Ann",
+        "Bob",
+    ]
+
+
+async def test_loader_tree(session: AsyncSession, statement_counter):
+    # 3 -> 1 -> 2 -> 3 is a cycle
+    parents = {1: 3, 2: 1, 3: 2, 4: 1, 5: 4, 6: 5}
+    session.add_all([Category(id=id_, parent_id=None) for id_ in parents])
+    await session.flush()
+    for category in await session.run_sync(
+        lambda sync_session: sync_session.query(Category).all()
+    ):
+        category.parent_id = parents[category.id]
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    statement_counter.clear()
+    children = Category.children.property
+    pages = await loader.tree_loader_for(children, 3).load_many([(1,), (6,)])
+    assert [[category.id for category in page] for page in pages] == [[2, 4], []]
+    assert len(statement_counter) == 1
+    # Levels above the last are known, and the cycle doesn't repeat objects
+    pages = await loader.loader_for(children).load_many(
+        [(None, (2,)), (None, (4,)), (None, (3,)), (None, (5,))]
+    )
+    assert [[category.id for category in page] for page in pages] == [
+        [3],
+        [5],
+        [1],
+        [6],
+    ]
+    await loader.tree_loader_for(children, 2).load_many([(1,), (2,)])
+    assert len(statement_counter) == 1
+
+
+@pytest.mark.parametrize("page_input", [None, RelativePageInput(first=1)])
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_joined(
+    session: AsyncSession, page_input, strategy, statement_counter
+):
+    session.add_all([Author(id=1, name="Ann"), Author(id=2, name="Bob")])
+    session.add_all([Book(id=1, author_id=1), Book(id=2, author_id=2)])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    statement_counter.clear()
+    pages = await loader.loader_for(
+        Author.books.property, frozenset({"title"}), joined=frozenset({"author"})
+    ).load_many([(page_input, (1,)), (page_input, (2,))])
+    assert len(statement_counter) == 1
+    books = [page[0] for page in pages]
+    assert [inspect(book).dict["author"].name for book in books] == ["Ann", "Bob"]
+    # Loaders of the joined relationship are primed
+    authors = await loader.loader_for(Book.author.property).load_many(
+        [(None, (1,)), (None, (2,))]
+    )
+    assert authors == [book.author for book in books]
+    assert loader._known[Book.author.property][(2,)] is books[1].author
+    assert len(statement_counter) == 1
+
+
+async def test_loader_primary_key(session: AsyncSession, statement_counter):
+    session.add_all([Author(id=1, name="Ann"), Author(id=2, name="Bob")])
+    session.add_all([Ticket(id=1, created_by_id=1, assignee_id=2)])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    statement_counter.clear()
+    created_by, assignee, missing = await asyncio.gather(
+        loader.loader_for(Ticket.created_by.property).load((None, (1,))),
+        loader.loader_for(Ticket.assignee.property).load((None, (2,))),
+        loader.loader_for(Ticket.assignee.property).load((None, (3,))),
+    )
+    # Authors of both relationships are loaded together
+    assert len(statement_counter) == 1
+    assert (created_by.name, assignee.name, missing) == ("Ann", "Bob", None)
+    assert loader.primary_key_loader_for(inspect(Author)).cache_map.keys() == {
+        (1,),
+        (2,),
+        (3,),
+    }
+
+
+async def test_loader_primary_key_projections(session: AsyncSession, statement_counter):
+    session.add_all(
+        [Author(id=i, name=name) for i, name in [(1, "Ann"), (2, "Bob"), (3, "Cy")]]
+    )
+    session.add_all([Ticket(id=1, created_by_id=1, assignee_id=2)])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    statement_counter.clear()
+    created_by, assignee = await asyncio.gather(
+        loader.loader_for(Ticket.created_by.property, frozenset({"name"})).load(
+            (None, (1,))
+        ),
+        loader.loader_for(Ticket.assignee.property, frozenset({"id"})).load(
+            (None, (2,))
+        ),
+    )
+    # Relationships selecting different fields still share a statement
+    assert len(statement_counter) == 1
+    assert (created_by.id, inspect(created_by).dict["name"]) == (1, "Ann")
+    assert assignee.id == 2
+
+    # Objects lacking selected columns are loaded again
+    assignee = await loader.loader_for(
+        Ticket.assignee.property, frozenset({"id"})
+    ).load((None, (3,)))
+    assert "name" not in inspect(assignee).dict
+    statement_counter.clear()
+    assignee = await loader.loader_for(
+        Ticket.assignee.property, frozenset({"name"})
+    ).load((None, (3,)))
+    assert len(statement_counter) == 1
+    assert inspect(assignee).dict["name"] == "Cy"
+
+
+async def test_loader_column(session: AsyncSession, statement_counter):
+    session.add_all([Book(id=1, summary="a"), Book(id=2, summary="b")])
+    session.add_all([Lawyer(id=1, bar="x"), Engineer(id=2)])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    statement_counter.clear()
+    load = loader.column_loader_for(inspect(Book), "summary").load
+    summaries = await asyncio.gather(*[load((i,)) for i in (1, 2, 3)])
+    assert len(statement_counter) == 1
+    assert "title" not in statement_counter[0]
+    assert summaries == ["a", "b", None]
+
+    statement_counter.clear()
+    load = loader.column_loader_for(inspect(Lawyer), "bar").load
+    assert await asyncio.gather(load((1,)), load((2,))) == ["x", None]
+    assert len(statement_counter) == 1
+
+
+async def test_loader_proxy(session: AsyncSession, statement_counter):
+    session.add_all([Author(id=1), Author(id=2), Author(id=3)])
+    tags = [Tag(id=i, name=name) for i, name in enumerate("abc", 1)]
+    session.add_all(
+        [
+            Book(id=1, author_id=1, tags=tags[:2]),
+            Book(id=2, author_id=1, tags=tags[2:]),
+            Book(id=3, author_id=2, tags=tags[1:2]),
+        ]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    statement_counter.clear()
+    load = loader.proxy_loader_for(
+        Author.books.property, Book.tags.property, total_count=True
+    ).load
+    pages = await asyncio.gather(*[load((None, (i,))) for i in (1, 2, 3)])
+    # Books are joined, not loaded
+    assert len(statement_counter) == 1
+    assert [[tag.name for tag in page] for page in pages] == [
+        ["a", "b", "c"],
+        ["b"],
+        [],
+    ]
+    assert [page.total_count for page in pages] == [3, 1, 0]
+
+    statement_counter.clear()
+    page_input = RelativePageInput(first=1, after=2)
+    pages = await asyncio.gather(*[load((page_input, (i,))) for i in (1, 2)])
+    # The empty page of the second author is counted separately
+    assert len(statement_counter) == 2
+    assert [[tag.name for tag in page] for page in pages] == [["c"], []]
+    assert [page.total_count for page in pages] == [3, 1]
+    assert pages[0].page_info.has_previous_page
+    assert not pages[0].page_info.has_next_page
+
+    statement_counter.clear()
+    load = loader.proxy_loader_for(Tag.books.property, Book.author.property).load
+    pages = await asyncio.gather(*[load((None, (i,))) for i in (1, 2)])
+    assert len(statement_counter) == 1
+    assert [[author.id for author in page] for page in pages] == [[1], [1, 2]]
+
+
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_keyset(session: AsyncSession, strategy):
+    session.add_all([Author(id=1), Author(id=2)])
+    titles = ["b", "a", "c", "a", "b"]
+    session.add_all(
+        [Book(id=i, author_id=1, title=title) for i, title in enumerate(titles, 1)]
+    )
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    for ordering, ids in [
+        ((), [1, 2, 3, 4, 5]),
+        ((("title", False),), [2, 4, 1, 5, 3]),
+        ((("title", True),), [3, 1, 5, 2, 4]),
+    ]:
+        load = loader.loader_for(
+            Author.books.property, total_count=True, ordering=ordering
+        ).load
+        after = RelativePageInput(
+            first=2, after_cursor=cursor_from_obj(Book(id=ids[1]))
+        )
+        page = await load((after, (1,)))
+        assert [book.id for book in page] == ids[2:4]
+        assert page.total_count == 5
+        assert page.page_info.has_previous_page and page.page_info.has_next_page
+
+        before = RelativePageInput(
+            last=3, before_cursor=cursor_from_obj(Book(id=ids[4]))
+        )
+        page = await load((before, (1,)))
+        assert [book.id for book in page] == ids[1:4]
+        assert page.page_info.has_previous_page and page.page_info.has_next_page
+
+        page = await load((after, (2,)))
+        assert page == [] and page.total_count == 0
+
+
+@pytest.mark.parametrize("strategy", ["window", "union_all"])
+async def test_loader_keyset_nulls(session: AsyncSession, strategy):
+    session.add(Author(id=1))
+    titles = ["b", None, "a", None, "b", "c"]
+    books = [Book(id=i, author_id=1, title=title) for i, title in enumerate(titles, 1)]
+    session.add_all(books)
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy=strategy)
+    for ordering, ids in [
+        ((("title", False),), [2, 4, 3, 1, 5, 6]),
+        ((("title", True),), [6, 1, 5, 3, 2, 4]),
+    ]:
+        # Same order as loaded relationships paged in memory
+        assert [book.id for book in sort(books, ordering)] == ids
+        load = loader.loader_for(Author.books.property, ordering=ordering).load
+        for i, id_ in enumerate(ids):
+            cursor = cursor_from_obj(Book(id=id_))
+            with warnings.catch_warnings():
+                # sqlakeyset warns about nullable ordering columns
+                warnings.simplefilter("error", UserWarning)
+                after, before = await asyncio.gather(
+                    load((RelativePageInput(first=10, after_cursor=cursor), (1,))),
+                    load((RelativePageInput(last=10, before_cursor=cursor), (1,))),
+                )
+            assert [book.id for book in after] == ids[i + 1 :]
+            assert [book.id for book in before] == ids[:i]
+
+
+def test_loader_max_batch_size_for():
+    loader = StrawberrySQLAlchemyLoader(bind=None, max_batch_size=5)
+    assert loader.max_batch_size_for(Author.books.property) == 5
+
+
+async def test_loader_max_batch_size_from_dialect(session: AsyncSession):
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    assert 0 < loader.max_batch_size_for(Author.books.property) < 999
+    # Keys of custom joins are bound as the rows of a compound select
+    assert loader.max_batch_size_for(Author.namesake_tags.property) == 500
+
+
+@pytest.mark.parametrize("page_input", [None, RelativePageInput(first=1)])
+async def test_loader_chunks(
+    engine: AsyncEngine, tables, page_input, statement_counter
+):
+    async with AsyncSession(engine) as session:
+        session.add_all([Author(id=i) for i in range(1, 8)])
+        session.add_all([Book(id=i, author_id=i % 7 + 1) for i in range(1, 15)])
+        await session.commit()
+
+    statement_counter.clear()
+    try:
+        loader = StrawberrySQLAlchemyLoader(bind=engine, max_batch_size=3)
+        keys = [(page_input, (i,)) for i in range(7, 0, -1)]
+        pages = await loader.loader_for(Author.books.property).load_many(keys)
+        assert len(statement_counter) == 3
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(book_tag.delete())
+            await conn.execute(Book.__table__.delete())
+            await conn.execute(Author.__table__.delete())
+
+    expected = [
+        sorted(i for i in range(1, 15) if i % 7 + 1 == a) for a in range(7, 0, -1)
+    ]
+    if page_input is not None:
+        expected = [ids[:1] for ids in expected]
+    assert [sorted(book.id for book in page) for page in pages] == expected
+
+
+async def test_loader_union_all_chunks(session: AsyncSession, statement_counter):
+    session.add_all([Author(id=1), Book(id=1, author_id=1), Book(id=2, author_id=1)])
+    await session.flush()
+    session.expunge_all()
+
+    loader = StrawberrySQLAlchemyLoader(bind=session, pagination_strategy="union_all")
+    page_input = RelativePageInput(first=1)
+    # 800 selects would exceed SQLite's limits of 500 compound selects, and of
+    # 999 bind parameters (each select binds the key, offset and limit)
+    window = _PageWindow.from_page_input(page_input)
+    assert loader._union_all_max_keys_for(Author.books.property, window) == 322
+    statement_counter.clear()
+    pages = await loader.loader_for(Author.books.property).load_many(
+        [(page_input, (i,)) for i in range(1, 801)]
+    )
+    assert len(statement_counter) == 3
+    assert [book.id for book in pages[0]] == [1]
+    assert all(page == [] for page in pages[1:])
+
+
+async def test_loader_concurrent(engine: AsyncEngine, tables, monkeypatch):
+    async with AsyncSession(engine) as session:
+        session.add_all([Author(id=1), Author(id=2)])
+        session.add_all([Book(id=i, author_id=i % 2 + 1) for i in range(1, 5)])
+        await session.commit()
+
+    running = []
+    peak = 0
+    execute_in_new_session = StrawberrySQLAlchemyLoader._execute_in_new_session
+
+    async def count_concurrency(self, statement):
+        nonlocal peak
+        running.append(statement)
+        peak = max(peak, len(running))
+        try:
+            # Let other statements start, unless the cap is reached
+            await asyncio.sleep(0.01)
+            return await execute_in_new_session(self, statement)
+        finally:
+            running.remove(statement)
+
+    monkeypatch.setattr(
+        StrawberrySQLAlchemyLoader, "_execute_in_new_session", count_concurrency
+    )
+    try:
+        async with StrawberrySQLAlchemyLoader(
+            bind=sessionmaker(engine, class_=AsyncSession), max_concurrency=2
+        ) as loader:
+            assert loader.concurrent
+            books, authors, titles = await asyncio.gather(
+                loader.loader_for(Author.books.property).load((None, (1,))),
+                loader.loader_for(Book.author.property).load_many(
+                    [(None, (1,)), (None, (2,))]
+                ),
+                loader.loader_for(Author.books.property, frozenset({"id"})).load(
+                    (None, (2,))
+                ),
+            )
+            # Objects from different statements share the request identity map
+            identical_books = await loader.loader_for(
+                Author.books.property, frozenset({"title"})
+            ).load((None, (1,)))
+            request_session = loader.session
+            assert request_session.sync_session.identity_map
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(Book.__table__.delete())
+            await conn.execute(Author.__table__.delete())
+
+    assert peak == 2
+    assert sorted(book.id for book in books) == [2, 4]
+    assert [author.id for author in authors] == [1, 2]
+    assert sorted(book.id for book in titles) == [1, 3]
+    for obj in [*books, *authors]:
+        assert inspect(obj).session is None
+    assert {id(book) for book in identical_books} == {id(book) for book in books}
+    # The request session, opened by the loader, is closed with it
+    assert not request_session.sync_session.identity_map
+
+
+async def test_loader_identity_map(session: AsyncSession, statement_counter):
+    session.add_all([Author(id=1, name="first"), Author(id=2, name="second")])
+    session.add_all([Book(id=1, author_id=1), Book(id=2, author_id=2)])
+    await session.flush()
+    session.expunge_all()
+    first = await session.get(Author, 1)
+
+    statement_counter.clear()
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    authors = await loader.loader_for(Book.author.property).load_many(
+        [(None, (1,)), (None, (2,))]
+    )
+    assert authors[0] is first
+    assert authors[1].id == 2
+    # Only the missing author is queried
+    assert statement_counter.parameters == [(2,)]
+
+    statement_counter.clear()
+    await loader.loader_for(Book.author.property, frozenset({"name"})).load_many(
+        [(None, (1,)), (None, (2,))]
+    )
+    assert statement_counter == []
+
+
+async def test_loader_prime_reverse(session: AsyncSession, statement_counter):
+    session.add_all([Author(id=1, name="first"), Author(id=2, name="second")])
+    session.add_all([Book(id=1, author_id=1), Book(id=2, author_id=1)])
+    await session.flush()
+    session.expunge_all()
+    first = await session.get(Author, 1)
+
+    loader = StrawberrySQLAlchemyLoader(bind=session)
+    author_loader = loader.loader_for(Book.author.property)
+    books = await loader.loader_for(Author.books.property).load((None, (1,)))
+    assert {book.id for book in books} == {1, 2}
+    assert author_loader.cache_map[(None, (1,))].result() is first
+    # Loaders created afterwards are primed as well
+    name_loader = loader.loader_for(Book.author.property, frozenset({"name"}))
+    assert name_loader.cache_map[(None, (1,))].result() is first
+
+    statement_counter.clear()
+    assert await author_loader.load((None, (1,))) is first
+    assert statement_counter == []
+
+
+async def test_loader_coalescer(engine: AsyncEngine, tables):
+    async with AsyncSession(engine) as session:
+        session.add_all([Author(id=1), Author(id=2)])
+        session.add_all([Book(id=i, author_id=i % 2 + 1) for i in range(1, 5)])
+        await session.commit()
+
+    coalescer = StatementCoalescer()
+    try:
+        first, second = [
+            StrawberrySQLAlchemyLoader(bind=engine, coalescer=coalescer)
+            for _ in range(2)
+        ]
+        first_books, second_books = await asyncio.gather(
+            first.loader_for(Author.books.property).load((None, (1,))),
+            second.loader_for(Author.books.property).load((None, (1,))),
+        )
+        # Statements executed afterwards are not served from the previous rows
+        await second.loader_for(Author.books.property).load((None, (2,)))
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(Book.__table__.delete())
+            await conn.execute(Author.__table__.delete())
+
+    assert coalescer.executed == 2
+    assert coalescer.coalesced == 1
+    assert coalescer._in_flight == {}
+    assert sorted(book.id for book in first_books) == [2, 4]
+    assert sorted(book.id for book in second_books) == [2, 4]
+    # Each request gets its own copy of shared rows
+    for loader, books in [(first, first_books), (second, second_books)]:
+        for book in books:
+            assert inspect(book).session is loader.session.sync_session
+
+
+async def test_coalescer_cancelled_leader():
+    coalescer = StatementCoalescer()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def execute():
+        started.set()
+        await release.wait()
+        return [("row",)]
+
+    leader = asyncio.ensure_future(coalescer.execute("key", execute))
+    await started.wait()
+    follower = asyncio.ensure_future(coalescer.execute("key", execute))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == [("row",)]
+    assert leader.cancelled()
+    assert coalescer.executed == 1
+    assert coalescer.coalesced == 1
+    assert coalescer._in_flight == {}
+
+
+def test_in_memory_cache_backend(monkeypatch):
+    backend = InMemoryCacheBackend(max_size=2)
+    backend.set("a", 1, None, ["author"])
+    backend.set("b", 2, 10, ["book"])
+    assert backend.get("a") == 1
+    backend.set("c", 3, None, ["book"])
+    # "b" is the least recently used entry
+    assert backend.get("b") is None
+    assert len(backend) == 2
+    backend.invalidate(["book"])
+    assert backend.get("c") is None
+    assert backend.get("a") == 1
+    backend.set("d", 4, 10, [])
+    monkeypatch.setattr("time.monotonic", lambda: float("inf"))
+    assert backend.get("d") is None
+
+
+async def test_loader_result_cache(engine: AsyncEngine, tables, statement_counter):
+    async with AsyncSession(engine) as session:
+        session.add_all([Author(id=1, name="first"), Book(id=1, author_id=1)])
+        await session.commit()
+
+    cache = LoaderCache()
+    statement_counter.clear()
+    try:
+
+        async def load(session):
+            loader = StrawberrySQLAlchemyLoader(bind=session, result_cache=cache)
+            return await asyncio.gather(
+                loader.loader_for(Author.books.property).load((None, (1,))),
+                loader.loader_for(Book.author.property).load((None, (1,))),
+                loader.loader_for(Book.author.property).load((None, (2,))),
+            )
+
+        async with AsyncSession(engine) as session:
+            await load(session)
+        assert cache.misses == 3
+        assert len(statement_counter) == 2
+
+        statement_counter.clear()
+        async with AsyncSession(engine) as session:
+            books, author, missing = await load(session)
+            assert statement_counter == []
+            assert [book.id for book in books] == [1]
+            assert author.name == "first"
+            assert missing is None
+            for obj in [*books, author]:
+                assert inspect(obj).session is session.sync_session
+            # Uncommitted changes are not shared with other sessions
+            author.name = "changed"
+            assert not cache.usable_by(session.sync_session, Book.author.property)
+            assert cache.usable_by(session.sync_session, Author.books.property)
+        assert cache.hits == 3
+
+        async with AsyncSession(engine) as session:
+            session.add(Book(id=2, author_id=1))
+            await session.commit()
+
+        statement_counter.clear()
+        async with AsyncSession(engine) as session:
+            books, author, _ = await load(session)
+            assert sorted(book.id for book in books) == [1, 2]
+            assert author.name == "first"
+        # Only the relationship depending on the book table is loaded again
+        assert len(statement_counter) == 1
+        # Results with joined relationships are kept apart
+        assert LoaderCache.key_for(
+            Author.books.property, None, None, (1,), joined=frozenset({"author"})
+        ) != LoaderCache.key_for(Author.books.property, None, None, (1,))
+    finally:
+        cache.close()
+        async with engine.begin() as conn:
+            await conn.execute(Book.__table__.delete())
+            await conn.execute(Author.__table__.delete())
@@ -1,14 +1,39 @@
+import dataclasses
 import enum
+from inspect import signature as inspect_signature
+from types import SimpleNamespace
 from typing import List, Optional
 import datetime
+import pytest
+from conftest import Model
 from models import create_employee_and_department_tables, create_employee_table
-from sqlalchemy import Column, Enum, Integer, String, Interval, ForeignKey
-from sqlalchemy.orm import relationship
+import strawberry
+from sqlalchemy import (
+    Column,
+    Enum,
+    Integer,
+    String,
+    Interval,
+    Text,
+    ForeignKey,
+    inspect,
+    select,
+)
+from sqlalchemy.orm import deferred, relationship, selectinload
 from sqlalchemy.dialects.postgresql.array import ARRAY
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from strawberry.type import StrawberryOptional, StrawberryList
+from strawberry.types import Info
+from strawberry.types.nodes import FragmentSpread, InlineFragment, SelectedField
 
-from strawberry_sqlalchemy_mapper import StrawberrySQLAlchemyMapper
+from strawberry_sqlalchemy_mapper import (
+    StrawberrySQLAlchemyLoader,
+    StrawberrySQLAlchemyMapper,
+)
+from strawberry_sqlalchemy_mapper.pinned import PinnedTable
+from strawberry_sqlalchemy_mapper.relay import Node, PagingList, RelativePageInput
 
 
 def _create_polymorphic_employee_table():
@@ -94,6 +119,34 @@ def test_get_polymorphic_base_model():
     )
 
 
+def test_polymorphic_classes_for():
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper()
+    Employee = _create_polymorphic_employee_table()
+
+    class Lawyer(Employee):
+        __mapper_args__ = {"polymorphic_identity": "lawyer"}
+
+    class Engineer(Employee):
+        __mapper_args__ = {"polymorphic_identity": "engineer"}
+
+    def field(name, selections=()):
+        return SelectedField(name, {}, {}, list(selections), None)
+
+    selections = [
+        field("id"),
+        InlineFragment("Lawyer", [field("id")], {}),
+        field("manager", [InlineFragment("Engineer", [field("id")], {})]),
+    ]
+    mapper = inspect(Employee)
+    assert strawberry_sqlalchemy_mapper._polymorphic_classes_for(
+        mapper, selections
+    ) == frozenset({Lawyer})
+    selections.append(FragmentSpread("fields", "Engineer", {}, [field("id")]))
+    assert strawberry_sqlalchemy_mapper._polymorphic_classes_for(
+        mapper, selections
+    ) == frozenset({Lawyer, Engineer})
+
+
 def test_convert_column_to_strawberry_type():
     strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper()
     int_column = Column(Integer, nullable=False)
@@ -189,6 +242,45 @@ def test_connection_resolver_for():
     )
 
 
+async def test_make_connection_wrapper_resolver():
+    Employee = create_employee_table()
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper()
+    connection_type = strawberry_sqlalchemy_mapper._connection_type_for("Employee")
+    info = SimpleNamespace(selected_fields=[])
+    calls = []
+
+    # Resolvers of the original signature are still supported
+    async def resolver(self, info, page_input):
+        calls.append(page_input)
+        return PagingList(total_count=0)
+
+    wrapper = strawberry_sqlalchemy_mapper.make_connection_wrapper_resolver(
+        resolver, "Employee", connection_type
+    )
+    assert list(inspect_signature(wrapper).parameters) == [
+        "self",
+        "info",
+        "page_input",
+    ]
+    connection = await wrapper(None, info, RelativePageInput(first=1))
+    assert connection.edges == [] and connection.total_count == 0
+    assert calls == [RelativePageInput(first=1)]
+
+    async def filtered_resolver(self, info, page_input, where=None):
+        calls.append(where)
+        return PagingList(total_count=0)
+
+    where_type = strawberry_sqlalchemy_mapper._where_type_for(Employee)
+    wrapper = strawberry_sqlalchemy_mapper.make_connection_wrapper_resolver(
+        filtered_resolver, "Employee", connection_type, where_type=where_type
+    )
+    parameters = inspect_signature(wrapper).parameters
+    assert list(parameters) == ["self", "info", "page_input", "where"]
+    assert parameters["where"].annotation == Optional[where_type]
+    await wrapper(None, info, where="where")
+    assert calls[-1] == "where"
+
+
 def test_type_simple():
     Employee = create_employee_table()
     strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper()
@@ -301,3 +393,588 @@ def test_default_arguments_last_input():
 
     assert type(user.type) == StrawberryOptional
     assert user.type.of_type == UserCreate
+
+
+class Currency(Model):
+    code = Column(String(3))
+    prices = relationship("Price", back_populates="currency")
+
+
+class Price(Model):
+    amount = Column(Integer)
+    label = Column(String(255))
+    currency_id = Column(Integer, ForeignKey("currency.id"))
+    currency = relationship("Currency", back_populates="prices")
+    usd = relationship(
+        "Currency",
+        primaryjoin="and_(Price.currency_id == Currency.id, Currency.code == 'USD')",
+        viewonly=True,
+    )
+
+
+async def test_pinned_models(engine: AsyncEngine, tables):
+    async with AsyncSession(engine) as session:
+        session.add_all([Currency(id=1, code="EUR"), Currency(id=2, code="USD")])
+        await session.commit()
+
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(pinned_models=[Currency])
+    load = strawberry_sqlalchemy_mapper._relationship_loader_for(
+        Price.currency.property
+    )
+    try:
+        await strawberry_sqlalchemy_mapper.refresh_pinned(engine)
+        pinned_table = strawberry_sqlalchemy_mapper.pinned_tables[Currency]
+        assert [currency.code for currency in pinned_table.objects] == ["EUR", "USD"]
+        # No loader is needed in the context
+        assert (await load(Price(currency_id=2), None)).code == "USD"
+        assert await load(Price(currency_id=3), None) is None
+        assert PinnedTable.supports(Price.currency.property)
+        assert not PinnedTable.supports(Price.usd.property)
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(Currency.__table__.delete())
+
+    await strawberry_sqlalchemy_mapper.refresh_pinned(engine)
+    assert len(strawberry_sqlalchemy_mapper.pinned_tables[Currency]) == 0
+    # Tables are replaced, not modified
+    assert len(pinned_table) == 2
+
+
+def _type_name(model) -> str:
+    return f"{model.__name__}Type"
+
+
+def _schema(mapper, model, type_, *criteria) -> strawberry.Schema:
+    """
+    Finalizes the mapper, and builds a schema whose `items` field lists
+    the `model` objects matching the criteria, in primary key order.
+    """
+
+    @strawberry.type
+    class Query:
+        @strawberry.field
+        async def items(self, info: Info) -> List[type_]:
+            result = await info.context["session"].execute(
+                select(model).where(*criteria).order_by(*inspect(model).primary_key)
+            )
+            return result.scalars().all()
+
+    mapper.finalize()
+    return strawberry.Schema(query=Query)
+
+
+@pytest.fixture
+def execute_query(engine: AsyncEngine, tables, statement_counter):
+    """
+    Stores the objects, executes the query with a fresh session and loader,
+    then deletes the rows of their tables. Returns the response, along with
+    the statements emitted by the query.
+    """
+
+    async def execute(schema, query, objects, *preload):
+        used_tables = {inspect(obj).mapper.local_table for obj in objects}
+        async with AsyncSession(engine) as session:
+            session.add_all(objects)
+            await session.commit()
+            session.expunge_all()
+            try:
+                # Keep preloaded objects referenced, the identity map is weak
+                session.info["preloaded"] = [
+                    (await session.execute(statement)).scalars().all()
+                    for statement in preload
+                ]
+                statement_counter.clear()
+                resp = await schema.execute(
+                    query,
+                    context_value={
+                        "session": session,
+                        "sqlalchemy_loader": StrawberrySQLAlchemyLoader(bind=session),
+                    },
+                )
+                return resp, list(statement_counter)
+            finally:
+                for table in reversed(Model.metadata.sorted_tables):
+                    if table in used_tables:
+                        await session.execute(table.delete())
+                await session.commit()
+
+    return execute
+
+
+async def test_aggregates(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(
+        model_to_type_name=_type_name,
+        generate_aggregates=True,
+    )
+
+    @strawberry_sqlalchemy_mapper.type(Currency)
+    class CurrencyType:
+        pass
+
+    @strawberry_sqlalchemy_mapper.type(Price)
+    class PriceType(Node):
+        id: strawberry.ID
+
+    schema = _schema(strawberry_sqlalchemy_mapper, Currency, CurrencyType)
+    aggregate_type = strawberry_sqlalchemy_mapper.aggregate_types["PriceTypeAggregate"]
+    assert {field.name for field in dataclasses.fields(aggregate_type)} == {
+        "count",
+        "sum",
+        "avg",
+        "min",
+        "max",
+    }
+    min_max_type = strawberry_sqlalchemy_mapper.aggregate_types[
+        "PriceTypeAggregateMinMax"
+    ]
+    assert "label" in {field.name for field in dataclasses.fields(min_max_type)}
+
+    query = """
+        query {
+            items {
+                code
+                pricesAggregate {
+                    count
+                    sum { amount }
+                    avg { amount }
+                    max { amount label }
+                }
+            }
+        }
+    """
+    resp, statements = await execute_query(
+        schema,
+        query,
+        [Currency(id=1, code="EUR"), Currency(id=2, code="USD")]
+        + [Price(id=i, amount=i * 10, label=f"p{i}", currency_id=1) for i in (1, 2)],
+    )
+
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {
+            "code": "EUR",
+            "pricesAggregate": {
+                "count": 2,
+                "sum": {"amount": 30},
+                "avg": {"amount": 15.0},
+                "max": {"amount": 20, "label": "p2"},
+            },
+        },
+        {
+            "code": "USD",
+            "pricesAggregate": {
+                "count": 0,
+                "sum": {"amount": None},
+                "avg": {"amount": None},
+                "max": {"amount": None, "label": None},
+            },
+        },
+    ]
+    # One statement for currencies, one GROUP BY statement for their prices
+    assert len(statements) == 2
+    assert "GROUP BY" in statements[1]
+
+
+async def test_filters(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(
+        model_to_type_name=_type_name,
+        generate_filters=True,
+    )
+
+    @strawberry_sqlalchemy_mapper.type(Currency)
+    class CurrencyType:
+        pass
+
+    @strawberry_sqlalchemy_mapper.type(Price)
+    class PriceType(Node):
+        id: strawberry.ID
+
+    schema = _schema(strawberry_sqlalchemy_mapper, Currency, CurrencyType)
+    where_type = strawberry_sqlalchemy_mapper.filter_types["PriceTypeWhere"]
+    assert {field.name for field in dataclasses.fields(where_type)} == {
+        "id",
+        "amount",
+        "label",
+        "currency_id",
+    }
+    schema_str = str(schema)
+    assert "where: PriceTypeWhere = null" in schema_str
+    assert "in: [String!] = null" in schema_str
+
+    query = """
+        query {
+            items {
+                code
+                prices(where: {amount: {gte: 15}, label: {in: ["p2", "p3"]}}) {
+                    totalCount
+                    edges { node { amount } }
+                }
+                unlabeled: prices(where: {label: {isNull: true}}) {
+                    totalCount
+                }
+            }
+        }
+    """
+    resp, statements = await execute_query(
+        schema,
+        query,
+        [
+            Currency(id=1, code="EUR"),
+            Currency(id=2, code="USD"),
+            Price(id=1, amount=10, label="p1", currency_id=1),
+            Price(id=2, amount=20, label="p2", currency_id=1),
+            Price(id=3, amount=30, label="p3", currency_id=2),
+            Price(id=4, amount=40, currency_id=2),
+        ],
+    )
+
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {
+            "code": "EUR",
+            "prices": {"totalCount": 1, "edges": [{"node": {"amount": 20}}]},
+            "unlabeled": {"totalCount": 0},
+        },
+        {
+            "code": "USD",
+            "prices": {"totalCount": 1, "edges": [{"node": {"amount": 30}}]},
+            "unlabeled": {"totalCount": 1},
+        },
+    ]
+    # One statement for currencies, and one for each filter of their prices
+    assert len(statements) == 3
+
+
+async def test_relationship_resolver_for_list(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(
+        model_to_type_name=_type_name,
+        generate_filters=True,
+    )
+
+    @strawberry_sqlalchemy_mapper.type(Price)
+    class PriceType(Node):
+        id: strawberry.ID
+
+    @strawberry_sqlalchemy_mapper.type(Currency)
+    class CurrencyType:
+        price_list: List[PriceType] = strawberry.field(
+            resolver=strawberry_sqlalchemy_mapper.relationship_resolver_for(
+                Currency.prices.property
+            )
+        )
+
+    resolver = strawberry_sqlalchemy_mapper.relationship_resolver_for(
+        Currency.prices.property
+    )
+    assert list(inspect_signature(resolver).parameters) == [
+        "self",
+        "info",
+        "page_input",
+    ]
+    schema = _schema(strawberry_sqlalchemy_mapper, Currency, CurrencyType)
+
+    query = """
+        query {
+            items {
+                code
+                priceList { amount }
+            }
+        }
+    """
+    resp, statements = await execute_query(
+        schema,
+        query,
+        [
+            Currency(id=1, code="EUR"),
+            Currency(id=2, code="USD"),
+            Price(id=1, amount=10, label="p1", currency_id=1),
+            Price(id=2, amount=20, label="p2", currency_id=1),
+        ],
+    )
+
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {"code": "EUR", "priceList": [{"amount": 10}, {"amount": 20}]},
+        {"code": "USD", "priceList": []},
+    ]
+    # Prices are loaded, not counted, with the selected columns only
+    assert len(statements) == 2
+    assert "label" not in statements[1]
+
+
+async def test_order_by(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(
+        model_to_type_name=_type_name,
+        generate_order_by=True,
+    )
+
+    @strawberry_sqlalchemy_mapper.type(Currency)
+    class CurrencyType:
+        pass
+
+    @strawberry_sqlalchemy_mapper.type(Price)
+    class PriceType(Node):
+        id: strawberry.ID
+
+    schema = _schema(strawberry_sqlalchemy_mapper, Currency, CurrencyType)
+    schema_str = str(schema)
+    assert "orderBy: [PriceTypeOrderBy!] = null" in schema_str
+    assert "where:" not in schema_str
+
+    query = """
+        query {
+            items {
+                prices(
+                    orderBy: [{label: ASC}, {amount: DESC}]
+                    pageInput: {first: 2}
+                ) {
+                    edges { node { id } }
+                }
+            }
+        }
+    """
+
+    def objects():
+        return [
+            Currency(id=1, code="EUR"),
+            Price(id=1, amount=10, label="b", currency_id=1),
+            Price(id=2, amount=20, label="a", currency_id=1),
+            Price(id=3, amount=30, label="b", currency_id=1),
+        ]
+
+    resp, _ = await execute_query(schema, query, objects())
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {"prices": {"edges": [{"node": {"id": "2"}}, {"node": {"id": "3"}}]}}
+    ]
+
+    # Relationships already loaded are sorted in memory
+    resp, statements = await execute_query(
+        schema,
+        query,
+        objects(),
+        select(Currency).options(selectinload(Currency.prices)),
+    )
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {"prices": {"edges": [{"node": {"id": "2"}}, {"node": {"id": "3"}}]}}
+    ]
+    assert len(statements) == 1
+
+
+class Folder(Model):
+    name = Column(String(255))
+    parent_id = Column(Integer, ForeignKey("folder.id"))
+    parent = relationship("Folder", remote_side="Folder.id", back_populates="children")
+    children = relationship("Folder", back_populates="parent")
+
+
+async def test_self_referential_tree(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(
+        model_to_type_name=_type_name,
+    )
+
+    @strawberry_sqlalchemy_mapper.type(Folder)
+    class FolderType(Node):
+        id: strawberry.ID
+
+    schema = _schema(
+        strawberry_sqlalchemy_mapper, Folder, FolderType, Folder.parent_id.is_(None)
+    )
+
+    query = """
+        query {
+            items {
+                children {
+                    edges { node {
+                        name
+                        children {
+                            edges { node {
+                                name
+                                children { edges { node { name } } }
+                            } }
+                        }
+                    } }
+                }
+            }
+        }
+    """
+    resp, statements = await execute_query(
+        schema,
+        query,
+        [
+            Folder(id=1, name="root"),
+            Folder(id=2, name="a", parent_id=1),
+            Folder(id=3, name="b", parent_id=1),
+            Folder(id=4, name="a1", parent_id=2),
+            Folder(id=5, name="a11", parent_id=4),
+            Folder(id=6, name="a111", parent_id=5),
+        ],
+    )
+
+    assert resp.errors is None
+
+    def node(name, *children):
+        return {"node": {"name": name, "children": {"edges": list(children)}}}
+
+    assert resp.data["items"] == [
+        {
+            "children": {
+                "edges": [
+                    node("a", node("a1", {"node": {"name": "a11"}})),
+                    node("b"),
+                ]
+            }
+        }
+    ]
+    # The root, then its three levels of children at once
+    assert len(statements) == 2
+    assert "RECURSIVE" in statements[1]
+
+
+async def test_joined_to_one(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(
+        model_to_type_name=_type_name,
+    )
+
+    @strawberry_sqlalchemy_mapper.type(Currency)
+    class CurrencyType:
+        pass
+
+    @strawberry_sqlalchemy_mapper.type(Price)
+    class PriceType(Node):
+        id: strawberry.ID
+
+    schema = _schema(strawberry_sqlalchemy_mapper, Currency, CurrencyType)
+
+    query = """
+        query {
+            items {
+                prices { edges { node { amount usd { code } } } }
+            }
+        }
+    """
+    resp, statements = await execute_query(
+        schema,
+        query,
+        [
+            Currency(id=1, code="EUR"),
+            Currency(id=2, code="USD"),
+            Price(id=1, amount=10, currency_id=1),
+            Price(id=2, amount=20, currency_id=2),
+        ],
+    )
+
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {"prices": {"edges": [{"node": {"amount": 10, "usd": None}}]}},
+        {"prices": {"edges": [{"node": {"amount": 20, "usd": {"code": "USD"}}}]}},
+    ]
+    # Currencies, then prices along with their USD currency
+    assert len(statements) == 2
+
+
+class Club(Model):
+    memberships = relationship("Membership", order_by="Membership.id")
+    members = association_proxy("memberships", "member")
+
+
+class Membership(Model):
+    club_id = Column(Integer, ForeignKey("club.id"))
+    member_id = Column(Integer, ForeignKey("member.id"))
+    member = relationship("Member")
+
+
+class Member(Model):
+    name = Column(String(255))
+
+
+async def test_association_proxy(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper(
+        model_to_type_name=_type_name,
+    )
+
+    @strawberry_sqlalchemy_mapper.type(Club)
+    class ClubType:
+        pass
+
+    @strawberry_sqlalchemy_mapper.type(Membership)
+    class MembershipType(Node):
+        id: strawberry.ID
+
+    @strawberry_sqlalchemy_mapper.type(Member)
+    class MemberType(Node):
+        id: strawberry.ID
+
+    schema = _schema(strawberry_sqlalchemy_mapper, Club, ClubType)
+
+    query = """
+        query {
+            items {
+                members(pageInput: {first: 1}) {
+                    edges { node { name } }
+                    totalCount
+                    pageInfo { hasNextPage }
+                }
+            }
+        }
+    """
+    resp, statements = await execute_query(
+        schema,
+        query,
+        [Club(id=1), Club(id=2)]
+        + [Member(id=i, name=name) for i, name in enumerate("abc", 1)]
+        + [
+            Membership(id=1, club_id=1, member_id=2),
+            Membership(id=2, club_id=1, member_id=1),
+            Membership(id=3, club_id=2, member_id=3),
+        ],
+    )
+
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {
+            "members": {
+                "edges": [{"node": {"name": "b"}}],
+                "totalCount": 2,
+                "pageInfo": {"hasNextPage": True},
+            }
+        },
+        {
+            "members": {
+                "edges": [{"node": {"name": "c"}}],
+                "totalCount": 1,
+                "pageInfo": {"hasNextPage": False},
+            }
+        },
+    ]
+    # Clubs, then members of both clubs, memberships being joined
+    assert len(statements) == 2
+
+
+class Report(Model):
+    title = Column(String(255))
+    body = deferred(Column(Text))
+
+
+async def test_deferred_columns(execute_query):
+    strawberry_sqlalchemy_mapper = StrawberrySQLAlchemyMapper()
+
+    @strawberry_sqlalchemy_mapper.type(Report)
+    class ReportType:
+        pass
+
+    schema = _schema(strawberry_sqlalchemy_mapper, Report, ReportType)
+    resp, statements = await execute_query(
+        schema,
+        "query { items { title body } }",
+        [Report(id=1, title="a", body="b"), Report(id=2, title="c")],
+    )
+
+    assert resp.errors is None
+    assert resp.data["items"] == [
+        {"title": "a", "body": "b"},
+        {"title": "c", "body": None},
+    ]
+    # Reports, then the body of both reports
+    assert len(statements) == 2
@@ -2,6 +2,7 @@ import random
 from typing import Any, Dict, Optional
 
 import hypothesis
+import pytest
 import strawberry
 from conftest import Model, TxManager
 from hypothesis import given
@@ -18,6 +19,8 @@ from strawberry_sqlalchemy_mapper.relay import (
     ConnectionMixin,
     Node,
     PageInput,
+    PagingList,
+    RelativePageInput,
     connection,
     cursor_from_obj,
 )
@@ -299,6 +302,227 @@ async def test_nested_pagination(
             )
 
 
+async def test_nested_pagination_aliases(transaction: TxManager):
+    query = """
+        query {
+            parents(pageInput: {first: 2}) {
+                edges {
+                    node {
+                        id
+                        head: children(pageInput: {first: 1}) {
+                            pageInfo { hasNextPage hasPreviousPage }
+                            edges { node { id } }
+                        }
+                        middle: children(pageInput: {first: 2, after: 1}) {
+                            pageInfo { hasNextPage hasPreviousPage }
+                            edges { node { id } }
+                        }
+                        tail: children(pageInput: {last: 2}) {
+                            pageInfo { hasNextPage hasPreviousPage }
+                            edges { node { id } }
+                        }
+                    }
+                }
+            }
+        }
+    """
+    objects = [Parent(id=1), Parent(id=2)]
+    objects += [Child(id=i, parent_id=1 + i % 2) for i in range(10)]
+
+    async with transaction() as session:
+        session.add_all(objects)
+        await session.flush()
+        session.expunge_all()
+
+        resp = await schema.execute(query, context_value=session_context(session))
+
+    assert resp.errors is None
+    for edge in resp.data["parents"]["edges"]:
+        node = edge["node"]
+        children = [i for i in range(10) if 1 + i % 2 == int(node["id"])]
+        pages = {
+            alias: (
+                [int(e["node"]["id"]) for e in node[alias]["edges"]],
+                node[alias]["pageInfo"],
+            )
+            for alias in ["head", "middle", "tail"]
+        }
+        assert pages["head"] == (
+            children[:1],
+            {"hasNextPage": True, "hasPreviousPage": False},
+        )
+        assert pages["middle"] == (
+            children[1:3],
+            {"hasNextPage": True, "hasPreviousPage": True},
+        )
+        assert pages["tail"] == (
+            children[-2:],
+            {"hasNextPage": False, "hasPreviousPage": True},
+        )
+
+
+async def test_nested_keyset_pagination(transaction: TxManager):
+    query = """
+        query($subPageInput: RelativePageInput) {
+            parents(pageInput: {first: 1}) {
+                edges {
+                    node {
+                        children(pageInput: $subPageInput) {
+                            pageInfo { hasNextPage hasPreviousPage endCursor }
+                            edges { cursor node { id } }
+                        }
+                    }
+                }
+            }
+        }
+    """
+    objects = [Parent(id=1)] + [Child(id=i, parent_id=1) for i in range(0, 10, 2)]
+
+    async def children(session, sub_page_input):
+        resp = await schema.execute(
+            query,
+            variable_values={"subPageInput": sub_page_input},
+            context_value=session_context(session),
+        )
+        assert resp.errors is None
+        return resp.data["parents"]["edges"][0]["node"]["children"]
+
+    async with transaction() as session:
+        session.add_all(objects)
+        await session.flush()
+        session.expunge_all()
+
+        first = await children(session, {"first": 2})
+        assert [int(e["node"]["id"]) for e in first["edges"]] == [0, 2]
+
+        # Rows inserted before the cursor don't shift the next page
+        session.add(Child(id=1, parent_id=1))
+        await session.flush()
+        session.expunge_all()
+
+        second = await children(
+            session, {"first": 2, "afterCursor": first["pageInfo"]["endCursor"]}
+        )
+        assert [int(e["node"]["id"]) for e in second["edges"]] == [4, 6]
+        assert second["pageInfo"]["hasNextPage"]
+        assert second["pageInfo"]["hasPreviousPage"]
+
+        previous = await children(
+            session, {"last": 2, "beforeCursor": second["edges"][0]["cursor"]}
+        )
+        assert [int(e["node"]["id"]) for e in previous["edges"]] == [1, 2]
+        assert previous["pageInfo"]["hasPreviousPage"]
+
+        # Forward pages start after a cursor, they can't end before one
+        resp = await schema.execute(
+            query,
+            variable_values={
+                "subPageInput": {
+                    "first": 2,
+                    "beforeCursor": first["pageInfo"]["endCursor"],
+                }
+            },
+            context_value=session_context(session),
+        )
+        assert "You can't use 'beforeCursor' with 'first'" in resp.errors[0].message
+
+
+def test_paging_list_keyset():
+    children = PagingList([Child(id=i) for i in range(5)])
+
+    page = children.page(
+        RelativePageInput(first=2, after_cursor=cursor_from_obj(children[0]))
+    )
+    assert [child.id for child in page] == [1, 2]
+    assert page.page_info.has_next_page and page.page_info.has_previous_page
+    assert page.total_count == 5
+
+    page = children.page(
+        RelativePageInput(last=3, before_cursor=cursor_from_obj(children[2]))
+    )
+    assert [child.id for child in page] == [0, 1]
+    assert page.page_info.has_next_page and not page.page_info.has_previous_page
+
+    page = children.page(
+        RelativePageInput(first=2, after_cursor=cursor_from_obj(Child(id=10)))
+    )
+    assert page == []
+
+    with pytest.raises(ValueError, match="'afterCursor' with 'last'"):
+        RelativePageInput(last=2, after_cursor=cursor_from_obj(children[0]))
+
+
+async def test_total_count(transaction: TxManager):
+    query = """
+        query {
+            parents(pageInput: {first: 1}) {
+                totalCount
+                edges {
+                    node {
+                        id
+                        children(pageInput: {first: 1}) {
+                            totalCount
+                            edges { node { id } }
+                        }
+                    }
+                }
+            }
+        }
+    """
+    objects = [Parent(id=1), Parent(id=2)]
+    objects += [Child(id=i, parent_id=1) for i in range(3)]
+
+    async with transaction() as session:
+        session.add_all(objects)
+        await session.flush()
+        session.expunge_all()
+
+        resp = await schema.execute(query, context_value=session_context(session))
+
+    assert resp.errors is None
+    assert resp.data["parents"]["totalCount"] == 2
+    (edge,) = resp.data["parents"]["edges"]
+    assert edge["node"]["children"]["totalCount"] == 3
+
+
+async def test_connection_without_edges(transaction: TxManager, statement_counter):
+    query = """
+        query {
+            parents(pageInput: {first: 1}) {
+                edges {
+                    node {
+                        id
+                        children(pageInput: {first: 2}) {
+                            totalCount
+                            pageInfo { hasNextPage hasPreviousPage }
+                        }
+                    }
+                }
+            }
+        }
+    """
+    objects = [Parent(id=1), *[Child(id=i, parent_id=1) for i in range(3)]]
+
+    async with transaction() as session:
+        session.add_all(objects)
+        await session.flush()
+        session.expunge_all()
+
+        statement_counter.clear()
+        resp = await schema.execute(query, context_value=session_context(session))
+        statements = list(statement_counter)
+
+    assert resp.errors is None
+    (edge,) = resp.data["parents"]["edges"]
+    assert edge["node"]["children"] == {
+        "totalCount": 3,
+        "pageInfo": {"hasNextPage": True, "hasPreviousPage": False},
+    }
+    # Children are counted, never loaded
+    assert not any("group_num" in statement for statement in statements)
+    assert any("count(*)" in statement for statement in statements)
+
+
 # TODO: Move this test
 # It does not test pagination but need top level defined schema (Parent/Child)
 async def test_loaded_state(transaction: TxManager):